@@ -23,6 +23,17 @@ except ImportError:
         'password': None            # UPDATE THIS
     }
 
+# Shared Connection Pool (created lazily on first use)
+_DB_POOL = None
+
+def get_db_pool(minconn=1, maxconn=8):
+    """Return the shared psycopg2 connection pool for DB_CONFIG."""
+    global _DB_POOL
+    if _DB_POOL is None:
+        from psycopg2.pool import ThreadedConnectionPool
+        _DB_POOL = ThreadedConnectionPool(minconn, maxconn, **DB_CONFIG)
+    return _DB_POOL
+
 # OMOP Concept Mappings (from Übung 2)
 OMOP_CONCEPTS = {
     'PaO2_FiO2_Ratio': 40762499,
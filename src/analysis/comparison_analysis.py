@@ -17,15 +17,226 @@ Date: 2025-06-17
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 from sqlalchemy import create_engine, text
 from datetime import datetime
+import functools
+import hashlib
+import io
+import json
 import logging
+import os
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
 from config_local import DB_CONFIG
 
+# Paired frames cached across runs, keyed on the state of both gold tables
+COMPARISON_CACHE_DIR = Path(__file__).resolve().parents[2] / 'output' / 'comparison_cache'
+
+# Most recent paired frames kept in COMPARISON_CACHE_DIR; older ones are evicted
+COMPARISON_CACHE_ENTRIES = 4
+
+# In-memory limit for COPY output before it spills to a temporary file
+COPY_SPOOL_BYTES = 256 * 1024 * 1024
+
+# Keys identifying the same observation in both configuration tables
+PAIR_KEYS = ('patient_id', 'hadm_id', 'stay_id', 'measurement_time')
+
+# Labels repeated on every row of a configuration table
+LABEL_COLUMNS = ('config_name', 'aggregation_method', 'imputation_method')
+
+# Per-configuration columns returned with _config1/_config2 suffixes
+PAIRED_COLUMNS = (
+    'apache_ii_score', 'sofa_score', 'saps_ii_score', 'oasis_score',
+    'total_parameters_used', 'data_quality_score',
+    *LABEL_COLUMNS
+)
+
+SCORE_COLUMNS = ('apache_ii_score', 'sofa_score', 'saps_ii_score', 'oasis_score')
+
+# Scores fit in float32 and ids in int32, halving the bytes every statistic scans;
+# labels become categoricals so they cost a small code per row instead of a string
+PAIRED_DTYPES = {
+    'patient_id': 'int32',
+    'hadm_id': 'int32',
+    'stay_id': 'int32',
+    **{f'{score}_{suffix}': 'float32' for score in SCORE_COLUMNS for suffix in ('config1', 'config2')},
+    **{f'{label}_{suffix}': 'category' for label in LABEL_COLUMNS for suffix in ('config1', 'config2')}
+}
+
+# Results table filled by save_comparison_results; COPY needs it to exist
+COMPARISON_RESULTS_DDL = """
+CREATE TABLE IF NOT EXISTS gold.config_comparison_analysis (
+    comparison_name TEXT,
+    config_1_name TEXT,
+    config_2_name TEXT,
+    score_type TEXT,
+    correlation_pearson DOUBLE PRECISION,
+    correlation_spearman DOUBLE PRECISION,
+    mean_absolute_difference DOUBLE PRECISION,
+    config_1_mean DOUBLE PRECISION,
+    config_1_median DOUBLE PRECISION,
+    config_1_std DOUBLE PRECISION,
+    config_2_mean DOUBLE PRECISION,
+    config_2_median DOUBLE PRECISION,
+    config_2_std DOUBLE PRECISION,
+    t_test_statistic DOUBLE PRECISION,
+    t_test_p_value DOUBLE PRECISION,
+    wilcoxon_statistic DOUBLE PRECISION,
+    wilcoxon_p_value DOUBLE PRECISION,
+    sample_size INTEGER,
+    analysis_date TIMESTAMP,
+    analysis_parameters JSONB
+)
+"""
+
+@functools.lru_cache(maxsize=None)
+def _shared_engine(connection_string):
+    """One pooled engine per connection string, shared by every comparison in the process"""
+    return create_engine(
+        connection_string,
+        pool_size=10,
+        max_overflow=5,
+        pool_pre_ping=True,
+        pool_recycle=1800
+    )
+
+def _masked_pearson(x, y, valid):
+    """Column-wise Pearson r over the rows where valid is True"""
+    n = valid.sum(axis=0)
+    x_centered = np.where(valid, x - np.where(valid, x, 0).sum(axis=0, dtype=np.float64) / n, 0.0)
+    y_centered = np.where(valid, y - np.where(valid, y, 0).sum(axis=0, dtype=np.float64) / n, 0.0)
+    return (x_centered * y_centered).sum(axis=0) / np.sqrt(
+        (x_centered ** 2).sum(axis=0) * (y_centered ** 2).sum(axis=0)
+    )
+
+def _correlation_p_value(r, n):
+    """Two-sided p-value of correlation coefficients, as scipy.stats.pearsonr reports it"""
+    t = r * np.sqrt((n - 2) / (1 - r ** 2))
+    return 2 * stats.t.sf(np.abs(t), n - 2)
+
+def _valid_pairs(merged_df, col1, col2):
+    """Both configurations' values for the rows where neither is missing"""
+    x = merged_df[col1].to_numpy(dtype=np.float64)
+    y = merged_df[col2].to_numpy(dtype=np.float64)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    return x[valid], y[valid]
+
+def _plot_score_distributions(merged_df):
+    """Box plots of each score under both configurations"""
+    # Set up the plotting style
+    plt.style.use('default')
+    sns.set_palette("husl")
+    
+    # Create subplots
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('Configuration Comparison: Score Distributions', fontsize=16, fontweight='bold')
+    
+    for i, score in enumerate(SCORE_COLUMNS):
+        ax = axes[i//2, i%2]
+        col1 = f"{score}_config1"
+        col2 = f"{score}_config2"
+        
+        if col1 in merged_df.columns and col2 in merged_df.columns:
+            # Box plot comparison
+            data_to_plot = [
+                values[~np.isnan(values)]
+                for values in (merged_df[col1].to_numpy(), merged_df[col2].to_numpy())
+            ]
+            
+            ax.boxplot(data_to_plot, labels=['Config 1 (Mean)', 'Config 2 (Median)'])
+            ax.set_title(f'{score.replace("_", " ").title()}')
+            ax.set_ylabel('Score Value')
+            ax.grid(True, alpha=0.3)
+    
+    plt.tight_layout()
+    plt.savefig('config_distribution_comparison.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
+def _plot_score_scatter(merged_df, correlations):
+    """Config 1 vs Config 2 density plots, annotated with Pearson r"""
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('Configuration Comparison: Scatter Plots', fontsize=16, fontweight='bold')
+    
+    for i, score in enumerate(SCORE_COLUMNS):
+        ax = axes[i//2, i%2]
+        col1 = f"{score}_config1"
+        col2 = f"{score}_config2"
+        
+        if col1 in merged_df.columns and col2 in merged_df.columns:
+            x, y = _valid_pairs(merged_df, col1, col2)
+            
+            if len(x) > 0:
+                # Density rendering: per-point scatter overdraws at this size
+                ax.hexbin(x, y, gridsize=80, mincnt=1, cmap='viridis')
+                
+                # Add diagonal line
+                min_val = min(x.min(), y.min())
+                max_val = max(x.max(), y.max())
+                ax.plot([min_val, max_val], [min_val, max_val], 'r--', alpha=0.8)
+                
+                ax.set_xlabel('Config 1 (Mean-based)')
+                ax.set_ylabel('Config 2 (Median-based)')
+                ax.set_title(f'{score.replace("_", " ").title()}')
+                ax.grid(True, alpha=0.3)
+                
+                # Add correlation coefficient
+                if score in correlations:
+                    r = correlations[score]['pearson_r']
+                    ax.text(0.05, 0.95, f'r = {r:.3f}', transform=ax.transAxes,
+                           bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8))
+    
+    plt.tight_layout()
+    plt.savefig('config_scatter_comparison.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
+def _plot_bland_altman(merged_df):
+    """Bland-Altman agreement plots for each score"""
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('Bland-Altman Plots: Agreement Analysis', fontsize=16, fontweight='bold')
+    
+    for i, score in enumerate(SCORE_COLUMNS):
+        ax = axes[i//2, i%2]
+        col1 = f"{score}_config1"
+        col2 = f"{score}_config2"
+        
+        if col1 in merged_df.columns and col2 in merged_df.columns:
+            x, y = _valid_pairs(merged_df, col1, col2)
+            
+            if len(x) > 0:
+                # Calculate Bland-Altman statistics
+                mean_scores = (x + y) / 2
+                diff_scores = x - y
+                
+                mean_diff = diff_scores.mean()
+                std_diff = diff_scores.std(ddof=1)
+                
+                # Create plot as a 2D density rather than one marker per pair
+                ax.hist2d(mean_scores, diff_scores, bins=100, cmin=1, cmap='viridis')
+                
+                # Add reference lines
+                ax.axhline(mean_diff, color='red', linestyle='-', label=f'Mean Diff: {mean_diff:.2f}')
+                ax.axhline(mean_diff + 1.96*std_diff, color='red', linestyle='--', 
+                          label=f'+1.96 SD: {mean_diff + 1.96*std_diff:.2f}')
+                ax.axhline(mean_diff - 1.96*std_diff, color='red', linestyle='--',
+                          label=f'-1.96 SD: {mean_diff - 1.96*std_diff:.2f}')
+                
+                ax.set_xlabel('Mean of Two Measurements')
+                ax.set_ylabel('Difference (Config1 - Config2)')
+                ax.set_title(f'{score.replace("_", " ").title()}')
+                ax.grid(True, alpha=0.3)
+                ax.legend(fontsize=8)
+    
+    plt.tight_layout()
+    plt.savefig('bland_altman_plots.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
 class ConfigurationComparison:
     """Compare results from two ETL configurations"""
     
@@ -56,60 +267,93 @@ class ConfigurationComparison:
         else:
             connection_string = f"postgresql://{DB_CONFIG['user']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
         
-        return create_engine(connection_string)
+        return _shared_engine(connection_string)
     
-    def load_configuration_data(self, table1, table2):
-        """Load data from both configuration tables"""
-        self.logger.info(f"📊 Loading data from {table1} and {table2}...")
-        
-        # Load config 1 data
-        query1 = f"""
-        SELECT 
-            patient_id, hadm_id, stay_id, measurement_time,
-            apache_ii_score, sofa_score, saps_ii_score, oasis_score,
-            total_parameters_used, data_quality_score,
-            config_name, aggregation_method, imputation_method
-        FROM gold.{table1}
-        WHERE apache_ii_score IS NOT NULL 
-          AND sofa_score IS NOT NULL
-        ORDER BY patient_id, measurement_time
-        """
+    def ensure_pairing_indexes(self, *tables):
+        """Create the composite pairing-key index on each gold table if missing"""
+        try:
+            # CONCURRENTLY cannot run inside a transaction block
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                for table in tables:
+                    conn.execute(text(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_pair_keys "
+                        f"ON gold.{table} ({', '.join(PAIR_KEYS)})"
+                    ))
+        except Exception as e:
+            # The join still works without the index, only slower
+            self.logger.warning(f"⚠️ Could not create pairing indexes: {e}")
+    
+    def _paired_cache_key(self, table1, table2):
+        """Fingerprint the comparison config and the state of both gold tables"""
+        # The gold writer stamps updated_at on every row it writes, so a re-run
+        # with another aggregation or imputation moves max(updated_at)
+        with self.engine.connect() as conn:
+            fingerprints = conn.execute(text(f"""
+                SELECT count(*), max(updated_at) FROM gold.{table1}
+                UNION ALL
+                SELECT count(*), max(updated_at) FROM gold.{table2}
+            """)).fetchall()
+        
+        (rows1, updated1), (rows2, updated2) = fingerprints
+        config_json = json.dumps(dict(self.config), sort_keys=True)
+        return hashlib.blake2b(
+            f"{table1}|{table2}|{rows1}|{rows2}|{updated1}|{updated2}|{config_json}".encode()
+        ).hexdigest()
+    
+    def load_paired_data_cached(self, table1, table2):
+        """Load paired observations, reusing the cached frame while both tables are unchanged"""
+        cache_path = COMPARISON_CACHE_DIR / f"{self._paired_cache_key(table1, table2)}.pkl"
+        if cache_path.exists():
+            merged = pd.read_pickle(cache_path)
+            self.logger.info(f"✅ {len(merged):,} paired observations loaded from cache")
+            return merged
+        
+        self.ensure_pairing_indexes(table1, table2)
+        merged = self.load_paired_data(table1, table2)
+        
+        COMPARISON_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        merged.to_pickle(cache_path)
+        
+        # Bound the cache: drop all but the most recently written frames
+        cached = sorted(COMPARISON_CACHE_DIR.glob('*.pkl'), key=lambda path: path.stat().st_mtime, reverse=True)
+        for stale in cached[COMPARISON_CACHE_ENTRIES:]:
+            stale.unlink(missing_ok=True)
+        return merged
+    
+    def load_paired_data(self, table1, table2):
+        """Load paired observations from both configuration tables, joined in the database"""
+        self.logger.info(f"📊 Loading paired data from {table1} and {table2}...")
         
-        df1 = pd.read_sql(query1, self.engine)
-        df1['config_source'] = 'config1'
-        
-        # Load config 2 data
-        query2 = f"""
-        SELECT 
-            patient_id, hadm_id, stay_id, measurement_time,
-            apache_ii_score, sofa_score, saps_ii_score, oasis_score,
-            total_parameters_used, data_quality_score,
-            config_name, aggregation_method, imputation_method
-        FROM gold.{table2}
-        WHERE apache_ii_score IS NOT NULL 
-          AND sofa_score IS NOT NULL
-        ORDER BY patient_id, measurement_time
+        select_columns = ',\n            '.join(
+            f"a.{column} AS {column}_config1, b.{column} AS {column}_config2"
+            for column in PAIRED_COLUMNS
+        )
+        query = f"""
+        SELECT
+            {', '.join(PAIR_KEYS)},
+            {select_columns}
+        FROM gold.{table1} a
+        JOIN gold.{table2} b USING ({', '.join(PAIR_KEYS)})
+        WHERE a.apache_ii_score IS NOT NULL
+          AND a.sofa_score IS NOT NULL
+          AND b.apache_ii_score IS NOT NULL
+          AND b.sofa_score IS NOT NULL
         """
         
-        df2 = pd.read_sql(query2, self.engine)
-        df2['config_source'] = 'config2'
-        
-        self.logger.info(f"✅ Loaded {len(df1):,} records from {table1}")
-        self.logger.info(f"✅ Loaded {len(df2):,} records from {table2}")
-        
-        return df1, df2
-    
-    def merge_for_comparison(self, df1, df2):
-        """Merge datasets for paired comparison"""
-        self.logger.info("🔄 Merging datasets for paired comparison...")
-        
-        # Merge on patient and time for paired comparison
-        merged = df1.merge(
-            df2, 
-            on=['patient_id', 'hadm_id', 'stay_id', 'measurement_time'],
-            suffixes=('_config1', '_config2'),
-            how='inner'
-        )
+        # COPY streams the result as CSV, parsed by pandas' C reader instead of
+        # boxing every value as a Python object; large results spill to disk
+        with tempfile.SpooledTemporaryFile(max_size=COPY_SPOOL_BYTES) as buffer:
+            conn = self.engine.raw_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+                cursor.close()
+                conn.commit()
+            finally:
+                conn.close()
+            
+            buffer.seek(0)
+            merged = pd.read_csv(buffer, dtype=PAIRED_DTYPES, parse_dates=['measurement_time'])
         
         self.logger.info(f"✅ {len(merged):,} paired observations for comparison")
         return merged
@@ -118,173 +362,89 @@ class ConfigurationComparison:
         """Calculate correlation statistics"""
         self.logger.info("📈 Calculating correlation statistics...")
         
-        score_columns = ['apache_ii_score', 'sofa_score', 'saps_ii_score', 'oasis_score']
+        score_columns = [
+            score for score in SCORE_COLUMNS
+            if f"{score}_config1" in merged_df.columns and f"{score}_config2" in merged_df.columns
+        ]
         correlations = {}
-        
-        for score in score_columns:
-            col1 = f"{score}_config1"
-            col2 = f"{score}_config2"
+        if not score_columns:
+            self.results['correlations'] = correlations
+            return correlations
+        
+        # (N, scores) matrices per configuration, copied because invalid pairs are
+        # masked in place; a pair is valid when both sides are present
+        config1 = merged_df[[f"{score}_config1" for score in score_columns]].to_numpy(np.float32, copy=True)
+        config2 = merged_df[[f"{score}_config2" for score in score_columns]].to_numpy(np.float32, copy=True)
+        valid = ~(np.isnan(config1) | np.isnan(config2))
+        config1[~valid] = np.nan
+        config2[~valid] = np.nan
+        n = valid.sum(axis=0)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Descriptive statistics, all scores at once
+            config1_mean = np.nanmean(config1, axis=0, dtype=np.float64)
+            config2_mean = np.nanmean(config2, axis=0, dtype=np.float64)
+            config1_std = np.nanstd(config1, axis=0, ddof=1, dtype=np.float64)
+            config2_std = np.nanstd(config2, axis=0, ddof=1, dtype=np.float64)
+            config1_median = np.nanmedian(config1, axis=0)
+            config2_median = np.nanmedian(config2, axis=0)
             
-            if col1 in merged_df.columns and col2 in merged_df.columns:
-                # Remove NaN values for correlation
-                valid_data = merged_df[[col1, col2]].dropna()
-                
-                if len(valid_data) > 10:  # Minimum sample size
-                    # Pearson correlation
-                    pearson_r, pearson_p = stats.pearsonr(valid_data[col1], valid_data[col2])
-                    
-                    # Spearman correlation
-                    spearman_r, spearman_p = stats.spearmanr(valid_data[col1], valid_data[col2])
-                    
-                    # Mean Absolute Difference
-                    mad = np.mean(np.abs(valid_data[col1] - valid_data[col2]))
-                    
-                    # Statistical tests
-                    t_stat, t_p = stats.ttest_rel(valid_data[col1], valid_data[col2])
-                    wilcoxon_stat, wilcoxon_p = stats.wilcoxon(valid_data[col1], valid_data[col2])
-                    
-                    correlations[score] = {
-                        'pearson_r': pearson_r,
-                        'pearson_p': pearson_p,
-                        'spearman_r': spearman_r,
-                        'spearman_p': spearman_p,
-                        'mean_absolute_difference': mad,
-                        't_test_stat': t_stat,
-                        't_test_p': t_p,
-                        'wilcoxon_stat': wilcoxon_stat,
-                        'wilcoxon_p': wilcoxon_p,
-                        'sample_size': len(valid_data),
-                        'config1_mean': valid_data[col1].mean(),
-                        'config1_median': valid_data[col1].median(),
-                        'config1_std': valid_data[col1].std(),
-                        'config2_mean': valid_data[col2].mean(),
-                        'config2_median': valid_data[col2].median(),
-                        'config2_std': valid_data[col2].std()
-                    }
-                    
-                    self.logger.info(f"  {score}: r={pearson_r:.3f}, MAD={mad:.3f}, n={len(valid_data)}")
-        
-        self.results['correlations'] = correlations
-        return correlations
-    
-    def create_visualizations(self, merged_df):
-        """Create comparison visualizations"""
-        self.logger.info("📊 Creating comparison visualizations...")
-        
-        score_columns = ['apache_ii_score', 'sofa_score', 'saps_ii_score', 'oasis_score']
-        
-        # Set up the plotting style
-        plt.style.use('default')
-        sns.set_palette("husl")
-        
-        # Create subplots
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('Configuration Comparison: Score Distributions', fontsize=16, fontweight='bold')
-        
-        for i, score in enumerate(score_columns):
-            ax = axes[i//2, i%2]
-            col1 = f"{score}_config1"
-            col2 = f"{score}_config2"
+            # Pearson correlation
+            pearson_r = _masked_pearson(config1, config2, valid)
+            pearson_p = _correlation_p_value(pearson_r, n)
             
-            if col1 in merged_df.columns and col2 in merged_df.columns:
-                # Box plot comparison
-                data_to_plot = [
-                    merged_df[col1].dropna(),
-                    merged_df[col2].dropna()
-                ]
-                
-                ax.boxplot(data_to_plot, labels=['Config 1 (Mean)', 'Config 2 (Median)'])
-                ax.set_title(f'{score.replace("_", " ").title()}')
-                ax.set_ylabel('Score Value')
-                ax.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        plt.savefig('config_distribution_comparison.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # Create scatter plots
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('Configuration Comparison: Scatter Plots', fontsize=16, fontweight='bold')
-        
-        for i, score in enumerate(score_columns):
-            ax = axes[i//2, i%2]
-            col1 = f"{score}_config1"
-            col2 = f"{score}_config2"
+            # Spearman correlation: Pearson on ranks, invalid pairs ranked last
+            spearman_r = _masked_pearson(
+                stats.rankdata(np.where(valid, config1, np.inf), axis=0),
+                stats.rankdata(np.where(valid, config2, np.inf), axis=0),
+                valid
+            )
+            spearman_p = _correlation_p_value(spearman_r, n)
             
-            if col1 in merged_df.columns and col2 in merged_df.columns:
-                valid_data = merged_df[[col1, col2]].dropna()
-                
-                if len(valid_data) > 0:
-                    ax.scatter(valid_data[col1], valid_data[col2], alpha=0.6)
-                    
-                    # Add diagonal line
-                    min_val = min(valid_data[col1].min(), valid_data[col2].min())
-                    max_val = max(valid_data[col1].max(), valid_data[col2].max())
-                    ax.plot([min_val, max_val], [min_val, max_val], 'r--', alpha=0.8)
-                    
-                    ax.set_xlabel('Config 1 (Mean-based)')
-                    ax.set_ylabel('Config 2 (Median-based)')
-                    ax.set_title(f'{score.replace("_", " ").title()}')
-                    ax.grid(True, alpha=0.3)
-                    
-                    # Add correlation coefficient
-                    if score in self.results.get('correlations', {}):
-                        r = self.results['correlations'][score]['pearson_r']
-                        ax.text(0.05, 0.95, f'r = {r:.3f}', transform=ax.transAxes,
-                               bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8))
-        
-        plt.tight_layout()
-        plt.savefig('config_scatter_comparison.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        self.logger.info("✅ Visualizations saved: config_distribution_comparison.png, config_scatter_comparison.png")
-    
-    def create_bland_altman_plots(self, merged_df):
-        """Create Bland-Altman plots for agreement analysis"""
-        self.logger.info("📊 Creating Bland-Altman plots...")
-        
-        score_columns = ['apache_ii_score', 'sofa_score', 'saps_ii_score', 'oasis_score']
-        
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('Bland-Altman Plots: Agreement Analysis', fontsize=16, fontweight='bold')
-        
-        for i, score in enumerate(score_columns):
-            ax = axes[i//2, i%2]
-            col1 = f"{score}_config1"
-            col2 = f"{score}_config2"
+            # Mean Absolute Difference and paired t-test on the differences
+            diff = np.where(valid, np.subtract(config1, config2, dtype=np.float64), 0.0)
+            mad = np.abs(diff).sum(axis=0) / n
+            diff_mean = diff.sum(axis=0) / n
+            diff_std = np.sqrt((np.where(valid, diff - diff_mean, 0.0) ** 2).sum(axis=0) / (n - 1))
+            t_stat = diff_mean / (diff_std / np.sqrt(n))
+            t_p = 2 * stats.t.sf(np.abs(t_stat), n - 1)
+        
+        # Signed-rank tests keep their own per-score pass over the shared
+        # differences; they are independent, so they run concurrently
+        tested = [j for j in range(len(score_columns)) if n[j] > 10]  # Minimum sample size
+        with ThreadPoolExecutor(max_workers=max(1, min(len(tested), os.cpu_count() or 1))) as executor:
+            wilcoxon_results = dict(zip(tested, executor.map(
+                lambda j: stats.wilcoxon(diff[valid[:, j], j]),
+                tested
+            )))
+        
+        for j in tested:
+            score = score_columns[j]
+            wilcoxon_stat, wilcoxon_p = wilcoxon_results[j]
             
-            if col1 in merged_df.columns and col2 in merged_df.columns:
-                valid_data = merged_df[[col1, col2]].dropna()
-                
-                if len(valid_data) > 0:
-                    # Calculate Bland-Altman statistics
-                    mean_scores = (valid_data[col1] + valid_data[col2]) / 2
-                    diff_scores = valid_data[col1] - valid_data[col2]
-                    
-                    mean_diff = diff_scores.mean()
-                    std_diff = diff_scores.std()
-                    
-                    # Create plot
-                    ax.scatter(mean_scores, diff_scores, alpha=0.6)
-                    
-                    # Add reference lines
-                    ax.axhline(mean_diff, color='red', linestyle='-', label=f'Mean Diff: {mean_diff:.2f}')
-                    ax.axhline(mean_diff + 1.96*std_diff, color='red', linestyle='--', 
-                              label=f'+1.96 SD: {mean_diff + 1.96*std_diff:.2f}')
-                    ax.axhline(mean_diff - 1.96*std_diff, color='red', linestyle='--',
-                              label=f'-1.96 SD: {mean_diff - 1.96*std_diff:.2f}')
-                    
-                    ax.set_xlabel('Mean of Two Measurements')
-                    ax.set_ylabel('Difference (Config1 - Config2)')
-                    ax.set_title(f'{score.replace("_", " ").title()}')
-                    ax.grid(True, alpha=0.3)
-                    ax.legend(fontsize=8)
-        
-        plt.tight_layout()
-        plt.savefig('bland_altman_plots.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        self.logger.info("✅ Bland-Altman plots saved: bland_altman_plots.png")
+            correlations[score] = {
+                'pearson_r': pearson_r[j],
+                'pearson_p': pearson_p[j],
+                'spearman_r': spearman_r[j],
+                'spearman_p': spearman_p[j],
+                'mean_absolute_difference': mad[j],
+                't_test_stat': t_stat[j],
+                't_test_p': t_p[j],
+                'wilcoxon_stat': wilcoxon_stat,
+                'wilcoxon_p': wilcoxon_p,
+                'sample_size': int(n[j]),
+                'config1_mean': config1_mean[j],
+                'config1_median': config1_median[j],
+                'config1_std': config1_std[j],
+                'config2_mean': config2_mean[j],
+                'config2_median': config2_median[j],
+                'config2_std': config2_std[j]
+            }
+            
+            self.logger.info(f"  {score}: r={pearson_r[j]:.3f}, MAD={mad[j]:.3f}, n={n[j]}")
+        
+        self.results['correlations'] = correlations
+        return correlations
     
     def save_comparison_results(self, comparison_name):
         """Save comparison results to database"""
@@ -318,25 +478,37 @@ class ConfigurationComparison:
                 'wilcoxon_p_value': stats['wilcoxon_p'],
                 'sample_size': stats['sample_size'],
                 'analysis_date': datetime.now(),
-                'analysis_parameters': {
+                'analysis_parameters': json.dumps({
                     'significance_level': 0.05,
                     'comparison_type': 'paired_analysis'
-                }
+                })
             }
             insert_data.append(record)
         
         # Convert to DataFrame and save
         df_results = pd.DataFrame(insert_data)
         
-        # Save to database
-        df_results.to_sql(
-            'config_comparison_analysis',
-            self.engine,
-            schema='gold',
-            if_exists='append',
-            index=False,
-            method='multi'
-        )
+        # Save to database with COPY FROM STDIN
+        buffer = io.StringIO()
+        df_results.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(COMPARISON_RESULTS_DDL)
+            cursor.copy_expert(
+                f"COPY gold.config_comparison_analysis ({', '.join(df_results.columns)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            cursor.close()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
         
         self.logger.info(f"✅ Saved {len(insert_data)} comparison results to gold.config_comparison_analysis")
     
@@ -384,28 +556,37 @@ def run_comparison(comparison_tables, comparison_config):
         # Initialize comparison analyzer
         analyzer = ConfigurationComparison(comparison_config)
         
-        # Load data
-        df1, df2 = analyzer.load_configuration_data(
+        # Load paired data, joined server-side unless both tables are unchanged
+        merged_df = analyzer.load_paired_data_cached(
             comparison_tables['table_1'], 
             comparison_tables['table_2']
         )
         
-        # Merge for comparison
-        merged_df = analyzer.merge_for_comparison(df1, df2)
-        
         if len(merged_df) == 0:
             analyzer.logger.warning("No matching records found for comparison")
             return False
         
         # Perform analysis
-        analyzer.calculate_correlations(merged_df)
-        analyzer.create_visualizations(merged_df)
-        analyzer.create_bland_altman_plots(merged_df)
-        
-        # Save results
-        comparison_name = f"Config_Comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        analyzer.save_comparison_results(comparison_name)
-        analyzer.generate_summary_report()
+        correlations = analyzer.calculate_correlations(merged_df)
+        
+        # Plots are independent sinks: render them in worker processes while results are saved
+        analyzer.logger.info("📊 Rendering comparison plots in parallel...")
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            plots = [
+                executor.submit(_plot_score_distributions, merged_df),
+                executor.submit(_plot_score_scatter, merged_df, correlations),
+                executor.submit(_plot_bland_altman, merged_df)
+            ]
+            
+            # Save results
+            comparison_name = f"Config_Comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            analyzer.save_comparison_results(comparison_name)
+            analyzer.generate_summary_report()
+            
+            for plot in plots:
+                plot.result()
+        analyzer.logger.info("✅ Plots saved: config_distribution_comparison.png, "
+                             "config_scatter_comparison.png, bland_altman_plots.png")
         
         analyzer.logger.info("🎉 Comparison analysis completed successfully!")
         return True
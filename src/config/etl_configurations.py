@@ -7,6 +7,13 @@ Contains parameter mappings and general configuration.
 For database configuration, see config_template.py and create config_local.py
 """
 
+import functools
+import re
+import sys
+import types
+
+import numpy as np
+
 # Database Configuration Import
 try:
     from config_local import DB_CONFIG
@@ -23,6 +30,14 @@ except ImportError:
         'password': None            # UPDATE THIS
     }
 
+def _freeze(mapping):
+    """Read-only view of a config dict with interned string keys and values"""
+    return types.MappingProxyType({
+        (sys.intern(key) if isinstance(key, str) else key):
+        (sys.intern(value) if isinstance(value, str) else value)
+        for key, value in mapping.items()
+    })
+
 # OMOP Concept Mappings (from Übung 2)
 OMOP_CONCEPTS = {
     'PaO2_FiO2_Ratio': 40762499,
@@ -53,7 +68,7 @@ OMOP_CONCEPTS = {
 }
 
 # Chart Events Parameters (mimiciv_icu.chartevents)
-CHART_PARAMETERS = [
+CHART_PARAMETERS = (
     'spo2',
     'respiratory rate', 
     'respiration rate',
@@ -64,10 +79,10 @@ CHART_PARAMETERS = [
     'pulse oximetry',
     'ventilator rate',
     'spontaneous rate'
-]
+)
 
 # Lab Events Parameters (mimiciv_hosp.labevents) 
-LAB_PARAMETERS = [
+LAB_PARAMETERS = (
     'ph',
     'paco2',
     'carbon dioxide',
@@ -92,14 +107,33 @@ LAB_PARAMETERS = [
     'vegf',
     'lactate',
     'lactic acid'
-]
+)
+
+# Precompiled lookups, built once at import:
+# one case-insensitive alternation per parameter list (its .pattern can be
+# passed to a SQL '~*' filter) and the reverse OMOP concept_id -> name index
+CHART_PARAM_RE = re.compile('|'.join(map(re.escape, CHART_PARAMETERS)), re.IGNORECASE)
+LAB_PARAM_RE = re.compile('|'.join(map(re.escape, LAB_PARAMETERS)), re.IGNORECASE)
+OMOP_BY_ID = {concept_id: name for name, concept_id in OMOP_CONCEPTS.items()}
+OMOP_IDS_FROZEN = frozenset(OMOP_CONCEPTS.values())
+
+# OMOP concepts as parallel arrays sorted by concept_id, for vectorized lookups
+_OMOP_ITEMS = sorted(OMOP_CONCEPTS.items(), key=lambda item: item[1])
+OMOP_IDS_NP = np.fromiter((concept_id for _, concept_id in _OMOP_ITEMS), dtype=np.int64)
+OMOP_NAMES_NP = np.array([name for name, _ in _OMOP_ITEMS])
+
+def omop_name(concept_ids):
+    """Vectorized concept_id -> OMOP name lookup; unknown ids map to ''"""
+    concept_ids = np.asarray(concept_ids, dtype=np.int64)
+    positions = np.searchsorted(OMOP_IDS_NP, concept_ids).clip(max=len(OMOP_IDS_NP) - 1)
+    return np.where(OMOP_IDS_NP[positions] == concept_ids, OMOP_NAMES_NP[positions], '')
 
 # =============================================================================
 # ETL CONFIGURATION - Two Different Configurations for Task 5.4
 # =============================================================================
 
 # Configuration 1: Mean-based approach (from Task 5.3)
-CONFIG_1 = {
+CONFIG_1 = _freeze({
     'name': 'mean_based_config',
     'description': 'Uses mean-based aggregation and mean imputation',
     'aggregation_method': 'mean',
@@ -109,10 +143,10 @@ CONFIG_1 = {
     'time_window_hours': 24,          # 24-hour time window
     'min_observations': 2,            # Minimum number of observations
     'output_table': 'gold_scores_config1'
-}
+})
 
 # Configuration 2: Median-based approach (alternative for Task 5.4)
-CONFIG_2 = {
+CONFIG_2 = _freeze({
     'name': 'median_based_config',
     'description': 'Uses median-based aggregation and median imputation',
     'aggregation_method': 'median',
@@ -122,11 +156,20 @@ CONFIG_2 = {
     'time_window_hours': 12,           # 12-hour time window (shorter)
     'min_observations': 3,             # Higher minimum observations
     'output_table': 'gold_scores_config2'
+})
+
+# Batch size (ICU stays per chunk) when streaming Silver -> Gold
+BATCH_CONFIG = {
+    'batch_size': 10000
 }
 
-# Active Configuration (default to CONFIG_1)
+# Active Configuration (default to CONFIG_1). The config mappings are frozen,
+# so set_active_config only ever rebinds this reference, never mutates it.
 ACTIVE_CONFIG = CONFIG_1
 
+# Bumped whenever ACTIVE_CONFIG is switched; keys the cached helper results
+_CONFIG_GEN = 0
+
 # Configuration switching function
 def set_active_config(config_number):
     """
@@ -135,12 +178,14 @@ def set_active_config(config_number):
     Args:
         config_number (int): 1 or 2
     """
-    global ACTIVE_CONFIG
+    global ACTIVE_CONFIG, _CONFIG_GEN
     if config_number == 1:
         ACTIVE_CONFIG = CONFIG_1
+        _CONFIG_GEN += 1
         print("Active configuration: {}".format(CONFIG_1['name']))
     elif config_number == 2:
         ACTIVE_CONFIG = CONFIG_2
+        _CONFIG_GEN += 1
         print("Active configuration: {}".format(CONFIG_2['name']))
     else:
         print("Invalid configuration number. Must be 1 or 2.")
@@ -150,7 +195,7 @@ def set_active_config(config_number):
 # =============================================================================
 
 # Comparative Analysis Settings
-COMPARISON_CONFIG = {
+COMPARISON_CONFIG = _freeze({
     'statistical_tests': {
         'correlation_methods': ['pearson', 'spearman'],
         'significance_level': 0.05,
@@ -167,10 +212,10 @@ COMPARISON_CONFIG = {
         'gender_stratification': True,
         'mortality_analysis': True
     }
-}
+})
 
 # Clinical Outcome Settings
-OUTCOME_CONFIG = {
+OUTCOME_CONFIG = _freeze({
     'mortality_types': [
         'hospital_mortality',
         'icu_mortality', 
@@ -181,10 +226,10 @@ OUTCOME_CONFIG = {
         'icu_stays': 'mimiciv_icu.icustays',
         'hospital_stays': 'mimiciv_hosp.admissions'
     }
-}
+})
 
 # Disease Comparison Settings (Option B from Task 5.4)
-DISEASE_COMPARISON_CONFIG = {
+DISEASE_COMPARISON_CONFIG = _freeze({
     'icd_codes': {
         # Add your chosen disease ICD codes from Exercise 1
         'primary_disease': [],        # Your chosen disease codes
@@ -196,13 +241,13 @@ DISEASE_COMPARISON_CONFIG = {
         'length_of_stay',
         'severity_scores'
     ]
-}
+})
 
 # =============================================================================
 # DATA QUALITY FILTERS (Existing settings preserved)
 # =============================================================================
 
-QUALITY_FILTERS = {
+QUALITY_FILTERS = _freeze({
     'chartevents': {
         'exclude_error': True,        # Exclude error = 1
         'require_valuenum': True      # Require non-null valuenum
@@ -211,7 +256,7 @@ QUALITY_FILTERS = {
         'exclude_flags': ['abnormal', 'error'],  # Exclude these flags
         'require_valuenum': True      # Require non-null valuenum
     }
-}
+})
 
 # Output Schema Configuration
 BRONZE_SCHEMA = 'bronze'
@@ -223,8 +268,12 @@ OUTPUT_TABLE = 'collection_disease'
 # HELPER FUNCTIONS
 # =============================================================================
 
-def get_config_summary():
-    """Returns summary of active configuration"""
+# Helpers keyed on (_CONFIG_GEN, id(ACTIVE_CONFIG)) are computed once per
+# active configuration; rebinding ACTIVE_CONFIG changes the key.
+
+@functools.lru_cache(maxsize=4)
+def _config_summary(config_gen, config_id):
+    """Builds the summary of the active configuration (cached)"""
     return {
         'active_config': ACTIVE_CONFIG['name'],
         'aggregation': ACTIVE_CONFIG['aggregation_method'],
@@ -234,8 +283,14 @@ def get_config_summary():
         'output_table': ACTIVE_CONFIG['output_table']
     }
 
-def validate_config():
-    """Validates configuration settings"""
+def get_config_summary():
+    """Returns summary of active configuration"""
+    # A fresh dict per call, so callers cannot mutate the cached summary
+    return dict(_config_summary(_CONFIG_GEN, id(ACTIVE_CONFIG)))
+
+@functools.lru_cache(maxsize=4)
+def _validate_config(config_gen, config_id):
+    """Validates the active configuration once; failures are not cached"""
     required_keys = ['name', 'aggregation_method', 'imputation_method', 
                      'outlier_handling', 'time_window_hours', 'output_table']
     
@@ -243,9 +298,14 @@ def validate_config():
         if key not in ACTIVE_CONFIG:
             raise ValueError("Missing configuration key: {}".format(key))
     
-    print("Configuration validation successful")
     return True
 
+def validate_config():
+    """Validates configuration settings"""
+    valid = _validate_config(_CONFIG_GEN, id(ACTIVE_CONFIG))
+    print("Configuration validation successful")
+    return valid
+
 def get_both_configs():
     """Returns both configurations for comparison analysis"""
     return {
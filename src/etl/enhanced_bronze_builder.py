@@ -152,7 +152,8 @@ class EnhancedBronzeBuilder:
         CREATE INDEX idx_bronze_time ON bronze.collection_disease (charttime);
         CREATE INDEX idx_bronze_item ON bronze.collection_disease (itemid);
         CREATE INDEX idx_bronze_sofa_system ON bronze.collection_disease (sofa_system);
-        CREATE INDEX idx_bronze_source ON bronze.collection_disease (source_table);
+        CREATE INDEX idx_bronze_source ON bronze.collection_disease (source_table)
+            INCLUDE (subject_id, hadm_id, stay_id, itemid, charttime);
         CREATE INDEX idx_bronze_subject_time ON bronze.collection_disease (subject_id, charttime);
         """
         
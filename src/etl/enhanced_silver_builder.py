@@ -169,6 +169,8 @@ class EnhancedSilverBuilder:
         CREATE INDEX idx_silver_charttime ON silver.collection_disease_std (charttime);
         CREATE INDEX idx_silver_concept ON silver.collection_disease_std (concept_id);
         CREATE INDEX idx_silver_sofa_system ON silver.collection_disease_std (sofa_system);
+        CREATE INDEX idx_silver_concept_name ON silver.collection_disease_std (concept_name)
+            INCLUDE (valuenum_std);
         """
         
         cur.execute(create_table_sql)
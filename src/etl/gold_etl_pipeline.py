@@ -25,6 +25,36 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from src.config.etl_configurations import *
 from config_local import DB_CONFIG
 
+# Silver concept names and their Gold parameter column names
+PARAMETER_COLUMN_MAPPING = {
+    'Respiratory Rate': 'respiratory_rate',
+    'Heart Rate': 'heart_rate',
+    'PaCO2': 'paco2',
+    'Tidal Volume': 'tidal_volume',
+    'Minute Ventilation': 'minute_ventilation',
+    'Creatinine': 'creatinine',
+    'pH': 'ph',
+    'Albumin': 'albumin',
+    'Uric Acid': 'uric_acid',
+    'NT-proBNP': 'nt_probnp',
+    'D-Dimer': 'd_dimer',
+    'Homocysteine': 'homocysteine',
+    'Procalcitonin': 'procalcitonin',
+    'IL-6': 'il_6',
+    'IL-8': 'il_8',
+    'IL-10': 'il_10',
+    'ST2': 'st2',
+    'Pentraxin-3': 'pentraxin_3',
+    'Fraktalkin': 'fraktalkin',
+    'sRAGE': 'srage',
+    'KL-6': 'kl_6',
+    'PAI-1': 'pai_1',
+    'VEGF': 'vegf'
+}
+
+# Parameter columns used for imputation and data quality counts
+PARAMETER_COLUMNS = list(PARAMETER_COLUMN_MAPPING.values())
+
 class GoldETLPipeline:
     """ETL Pipeline for Gold layer score calculations with dual configurations"""
     
@@ -128,43 +158,41 @@ class GoldETLPipeline:
         self.logger.info(f"✅ Aggregated to {len(aggregated):,} measurements")
         return aggregated
     
+    def _concept_quantile_bounds(self, df, lower_q, upper_q):
+        """Per-row lower/upper quantiles of each row's concept, from one grouped pass"""
+        # Selected by label: an empty frame unstacks to no quantile columns at all
+        quantiles = (
+            df.groupby('concept_name')['value'].quantile([lower_q, upper_q])
+            .unstack()
+            .reindex(columns=[lower_q, upper_q])
+        )
+        lower = df['concept_name'].map(quantiles[lower_q])
+        upper = df['concept_name'].map(quantiles[upper_q])
+        return lower, upper
+    
     def _remove_outliers_iqr(self, df):
         """Remove outliers using IQR method"""
-        outlier_count = 0
+        Q1, Q3 = self._concept_quantile_bounds(df, 0.25, 0.75)
+        IQR = Q3 - Q1
         
-        for concept in df['concept_name'].unique():
-            concept_data = df[df['concept_name'] == concept]['value']
-            Q1 = concept_data.quantile(0.25)
-            Q3 = concept_data.quantile(0.75)
-            IQR = Q3 - Q1
-            
-            lower_bound = Q1 - self.config['outlier_threshold'] * IQR
-            upper_bound = Q3 + self.config['outlier_threshold'] * IQR
-            
-            outliers = (df['concept_name'] == concept) & \
-                      ((df['value'] < lower_bound) | (df['value'] > upper_bound))
-            
-            outlier_count += outliers.sum()
-            df = df[~outliers]
+        lower_bound = Q1 - self.config['outlier_threshold'] * IQR
+        upper_bound = Q3 + self.config['outlier_threshold'] * IQR
+        
+        outliers = (df['value'] < lower_bound) | (df['value'] > upper_bound)
+        outlier_count = outliers.sum()
+        df = df[~outliers]
         
         self.logger.info(f"🚨 Removed {outlier_count:,} outliers using IQR method")
         return df
     
     def _remove_outliers_percentile(self, df):
         """Remove outliers using percentile method"""
-        outlier_count = 0
         threshold = self.config['outlier_threshold']
+        lower_bound, upper_bound = self._concept_quantile_bounds(df, threshold, 1 - threshold)
         
-        for concept in df['concept_name'].unique():
-            concept_data = df[df['concept_name'] == concept]['value']
-            lower_bound = concept_data.quantile(threshold)
-            upper_bound = concept_data.quantile(1 - threshold)
-            
-            outliers = (df['concept_name'] == concept) & \
-                      ((df['value'] < lower_bound) | (df['value'] > upper_bound))
-            
-            outlier_count += outliers.sum()
-            df = df[~outliers]
+        outliers = (df['value'] < lower_bound) | (df['value'] > upper_bound)
+        outlier_count = outliers.sum()
+        df = df[~outliers]
         
         self.logger.info(f"🚨 Removed {outlier_count:,} outliers using percentile method")
         return df
@@ -181,35 +209,8 @@ class GoldETLPipeline:
             aggfunc='first'  # Take first value if duplicates
         ).reset_index()
         
-        # Rename columns to match our schema
-        column_mapping = {
-            'Respiratory Rate': 'respiratory_rate',
-            'Heart Rate': 'heart_rate',
-            'PaCO2': 'paco2',
-            'Tidal Volume': 'tidal_volume',
-            'Minute Ventilation': 'minute_ventilation',
-            'Creatinine': 'creatinine',
-            'pH': 'ph',
-            'Albumin': 'albumin',
-            'Uric Acid': 'uric_acid',
-            'NT-proBNP': 'nt_probnp',
-            'D-Dimer': 'd_dimer',
-            'Homocysteine': 'homocysteine',
-            'Procalcitonin': 'procalcitonin',
-            'IL-6': 'il_6',
-            'IL-8': 'il_8',
-            'IL-10': 'il_10',
-            'ST2': 'st2',
-            'Pentraxin-3': 'pentraxin_3',
-            'Fraktalkin': 'fraktalkin',
-            'sRAGE': 'srage',
-            'KL-6': 'kl_6',
-            'PAI-1': 'pai_1',
-            'VEGF': 'vegf'
-        }
-        
         # Rename columns that exist
-        existing_columns = {k: v for k, v in column_mapping.items() if k in pivoted.columns}
+        existing_columns = {k: v for k, v in PARAMETER_COLUMN_MAPPING.items() if k in pivoted.columns}
         pivoted = pivoted.rename(columns=existing_columns)
         
         self.logger.info(f"✅ Created {len(pivoted):,} patient-time records")
@@ -219,7 +220,7 @@ class GoldETLPipeline:
         """Apply configuration-specific imputation"""
         self.logger.info(f"🔧 Applying {self.config['imputation_method']} imputation...")
         
-        numeric_columns = df.select_dtypes(include=[np.number]).columns
+        numeric_columns = [col for col in PARAMETER_COLUMNS if col in df.columns]
         missing_before = df[numeric_columns].isnull().sum().sum()
         
         if self.config['imputation_method'] == 'mean':
@@ -253,7 +254,7 @@ class GoldETLPipeline:
         
         # Add quality metrics
         total_params = 25  # Total possible parameters
-        df['total_parameters_used'] = df.select_dtypes(include=[np.number]).notna().sum(axis=1)
+        df['total_parameters_used'] = df.reindex(columns=PARAMETER_COLUMNS).notna().sum(axis=1)
         df['missing_parameters'] = total_params - df['total_parameters_used']
         df['data_quality_score'] = df['total_parameters_used'] / total_params
         
@@ -344,9 +345,10 @@ class GoldETLPipeline:
         
         # Add timing information
         df['measurement_time'] = df['charttime']
-        df['calculation_time'] = datetime.now()
-        df['created_at'] = datetime.now()
-        df['updated_at'] = datetime.now()
+        now = datetime.now()
+        df['calculation_time'] = now
+        df['created_at'] = now
+        df['updated_at'] = now
         
         # Rename for output schema
         df = df.rename(columns={
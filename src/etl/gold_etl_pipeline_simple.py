@@ -13,11 +13,16 @@ Author: Medical Data Science Team
 Date: 2025-06-17
 """
 
+import functools
+import io
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
 import sys
 import sys
 import os
@@ -28,11 +33,138 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
 from etl_configurations import *
 from config_local import DB_CONFIG
 
+# Silver concepts used by the simplified scores and their Gold column names
+PARAMETER_CONCEPTS = {
+    'Respiratory Rate': 'respiratory_rate',
+    'Heart Rate': 'heart_rate',
+    'PaCO2': 'paco2',
+    'Creatinine': 'creatinine',
+    'pH': 'ph'
+}
+
+PARAMETER_COLUMNS = list(PARAMETER_CONCEPTS.values())
+
+# Total number of parameters the data quality score is measured against
+TOTAL_PARAMETERS = 25
+
+# Gold output schema, in table column order
+OUTPUT_COLUMNS = [
+    'patient_id', 'hadm_id', 'stay_id', 'measurement_time', 'calculation_time',
+    'config_name', 'aggregation_method', 'imputation_method', 'outlier_handling',
+    'time_window_hours', 'apache_ii_score', 'sofa_score', 'saps_ii_score', 'oasis_score'
+] + PARAMETER_COLUMNS + [
+    'total_parameters_used', 'missing_parameters', 'imputed_parameters',
+    'data_quality_score', 'created_at', 'updated_at'
+]
+
+# Gold tables the pipeline may write to; output_table is interpolated into SQL
+GOLD_OUTPUT_TABLES = {CONFIG_1['output_table'], CONFIG_2['output_table']}
+
+# psycopg2 engine options for the to_sql fallback: to_sql(method=None) runs
+# executemany, which SQLAlchemy batches into multi-row INSERT ... VALUES pages
+ENGINE_OPTIONS = {
+    'executemany_mode': 'values_plus_batch',
+    'insertmanyvalues_page_size': 10000,
+    'executemany_batch_page_size': 500,
+    'pool_pre_ping': False
+}
+
+# Per-concept SQL aggregate for each configured aggregation method
+AGGREGATE_SQL = {
+    'mean': "AVG(valuenum_std) FILTER (WHERE concept_name = '{concept}')",
+    'median': "PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY valuenum_std) FILTER (WHERE concept_name = '{concept}')"
+}
+
+# Simplified score ladders: (input column, ascending thresholds, points per band).
+# A value earns the points of the highest threshold it strictly exceeds.
+SCORE_LADDERS = {
+    'apache_ii_score': [
+        ('heart_rate', np.array([110.0, 150.0]), np.array([0, 2, 4])),
+        ('respiratory_rate', np.array([25.0, 35.0]), np.array([0, 1, 4])),
+        ('creatinine', np.array([1.2, 2.0, 3.5]), np.array([0, 2, 3, 4]))
+    ],
+    'sofa_score': [
+        ('respiratory_rate', np.array([25.0, 30.0]), np.array([0, 1, 2])),
+        ('heart_rate', np.array([120.0]), np.array([0, 2])),
+        ('creatinine', np.array([1.2, 2.0, 3.5, 5.0]), np.array([0, 1, 2, 3, 4]))
+    ],
+    'saps_ii_score': [
+        ('heart_rate', np.array([120.0, 160.0]), np.array([0, 4, 7]))
+    ],
+    'oasis_score': [
+        ('heart_rate', np.array([125.0]), np.array([0, 3]))
+    ]
+}
+
+# Upper bound of each score
+SCORE_MAXIMUMS = {
+    'apache_ii_score': 71,
+    'sofa_score': 24,
+    'saps_ii_score': 163,
+    'oasis_score': 7
+}
+
+def ladder_points(values, thresholds, points):
+    """Look up ladder points for an array of values; missing values score 0"""
+    # side='left' counts thresholds strictly below each value, matching '>'
+    bands = np.searchsorted(thresholds, values, side='left')
+    bands[np.isnan(values)] = 0
+    return points[bands]
+
+def connection_string():
+    """SQLAlchemy URL for DB_CONFIG"""
+    if DB_CONFIG.get('password'):
+        return "postgresql://{}:{}@{}:{}/{}".format(
+            DB_CONFIG['user'], DB_CONFIG['password'], DB_CONFIG['host'], 
+            DB_CONFIG['port'], DB_CONFIG['database']
+        )
+    return "postgresql://{}@{}:{}/{}".format(
+        DB_CONFIG['user'], DB_CONFIG['host'], DB_CONFIG['port'], DB_CONFIG['database']
+    )
+
+def ensure_indexes(engine, logger=None):
+    """Create the Silver index that serves the per-stay load query, if permitted"""
+    # Sorted on the GROUP BY keys and covering every column the load reads,
+    # so the aggregation is an index-only scan without a Sort node
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_silver_gold_load
+                ON silver.collection_disease_std (subject_id, hadm_id, stay_id)
+                INCLUDE (charttime, concept_name, valuenum_std)
+                WHERE valuenum_std IS NOT NULL
+            """))
+        return True
+    except Exception as e:
+        # The load still works without it, just with a sort over Silver
+        (logger or logging.getLogger('GoldETL')).warning("Could not create Silver load index: {}".format(e))
+        return False
+
+@dataclass(slots=True, frozen=True)
+class GoldConfig:
+    """Typed, immutable view of one ETL configuration dict"""
+    name: str
+    aggregation_method: str
+    imputation_method: str
+    outlier_handling: str
+    time_window_hours: int
+    output_table: str
+    description: str = ''
+    outlier_threshold: Optional[float] = None
+    min_observations: Optional[int] = None
+    
+    @classmethod
+    def from_dict(cls, config):
+        """Build a GoldConfig from a CONFIG_1/CONFIG_2 style dict"""
+        return cls(**{key: config[key] for key in cls.__slots__ if key in config})
+
 class GoldETLPipeline:
     """ETL Pipeline for Gold layer score calculations with dual configurations"""
     
     def __init__(self, config):
-        self.config = config
+        self.config = config if isinstance(config, GoldConfig) else GoldConfig.from_dict(config)
+        if self.config.output_table not in GOLD_OUTPUT_TABLES:
+            raise ValueError("Unsupported output table: {}".format(self.config.output_table))
         self.logger = self._setup_logging()
         self.engine = self._create_engine()
         self.stats = {
@@ -41,10 +173,11 @@ class GoldETLPipeline:
             'scores_calculated': 0,
             'quality_issues': 0
         }
+        self.patient_ids = set()
     
     def _setup_logging(self):
         """Setup logging for ETL pipeline"""
-        logger_name = 'GoldETL_' + self.config["name"]
+        logger_name = 'GoldETL_' + self.config.name
         logger = logging.getLogger(logger_name)
         logger.setLevel(logging.INFO)
         
@@ -59,143 +192,88 @@ class GoldETLPipeline:
     
     def _create_engine(self):
         """Create database engine"""
-        if DB_CONFIG.get('password'):
-            connection_string = "postgresql://{}:{}@{}:{}/{}".format(
-                DB_CONFIG['user'], DB_CONFIG['password'], DB_CONFIG['host'], 
-                DB_CONFIG['port'], DB_CONFIG['database']
-            )
-        else:
-            connection_string = "postgresql://{}@{}:{}/{}".format(
-                DB_CONFIG['user'], DB_CONFIG['host'], DB_CONFIG['port'], DB_CONFIG['database']
-            )
-        
-        return create_engine(connection_string)
+        return create_engine(connection_string(), **ENGINE_OPTIONS)
     
-    def load_silver_data(self):
-        """Load and prepare data from Silver layer"""
-        self.logger.info("Loading data from Silver layer...")
+    def _build_silver_query(self):
+        """Build the per-stay aggregation query for the configured method"""
+        method = self.config.aggregation_method
+        if method not in AGGREGATE_SQL:
+            raise ValueError("Unsupported aggregation method: {}".format(method))
+        
+        parameter_columns = ",\n            ".join(
+            "{} AS {}".format(AGGREGATE_SQL[method].format(concept=concept), column)
+            for concept, column in PARAMETER_CONCEPTS.items()
+        )
         
-        query = """
+        return """
         SELECT 
             subject_id,
             hadm_id,
             stay_id,
-            charttime,
-            concept_name,
-            valuenum_std as value,
-            unit_std as unit,
-            sofa_system,
-            quality_flags::text as quality_flags
+            MIN(charttime) AS charttime,
+            COUNT(*) AS measurement_count,
+            {}
         FROM silver.collection_disease_std
         WHERE valuenum_std IS NOT NULL
-        ORDER BY subject_id, stay_id, charttime
-        """
+          AND hadm_id IS NOT NULL
+          AND stay_id IS NOT NULL
+        GROUP BY subject_id, hadm_id, stay_id
+        ORDER BY subject_id, stay_id
+        """.format(parameter_columns)
+    
+    def _prepare_silver_frame(self, df):
+        """Record measurement counts and downcast identifiers of a loaded Silver frame"""
+        self.stats['measurements_processed'] += int(df['measurement_count'].sum())
+        df = df.drop(columns='measurement_count')
         
-        df = pd.read_sql(query, self.engine)
-        self.stats['measurements_processed'] = len(df)
+        # Identifiers fit in unsigned 32-bit; values stay float64 so the
+        # score thresholds (e.g. creatinine > 1.2) compare exactly
+        for column in ('subject_id', 'hadm_id', 'stay_id'):
+            df[column] = pd.to_numeric(df[column], downcast='unsigned')
         
-        self.logger.info("Loaded {} measurements from Silver layer".format(len(df)))
         return df
     
-    def prepare_for_gold_calculation(self, df):
-        """Prepare and aggregate data for gold layer calculation"""
-        self.logger.info("Preparing data for gold layer calculation...")
-        
-        # Apply configuration-specific filtering and aggregation
-        if self.config['aggregation_method'] == 'mean':
-            # Group by patient and take mean values
-            grouped = df.groupby(['subject_id', 'hadm_id', 'stay_id', 'concept_name']).agg({
-                'value': 'mean',
-                'charttime': 'first'  # Take first charttime for reference
-            }).reset_index()
-        elif self.config['aggregation_method'] == 'median':
-            # Group by patient and take median values
-            grouped = df.groupby(['subject_id', 'hadm_id', 'stay_id', 'concept_name']).agg({
-                'value': 'median',
-                'charttime': 'first'
-            }).reset_index()
-        else:
-            grouped = df
-        
-        # Pivot to get one row per patient with all measurements as columns
-        pivoted = grouped.pivot_table(
-            index=['subject_id', 'hadm_id', 'stay_id', 'charttime'],
-            columns='concept_name',
-            values='value',
-            aggfunc='first'
-        ).reset_index()
+    def load_silver_data(self):
+        """Load Silver data aggregated to one row per stay (pivot done in SQL)"""
+        self.logger.info("Loading aggregated data from Silver layer...")
         
-        # Rename columns to match our expected schema
-        column_mapping = {
-            'Respiratory Rate': 'respiratory_rate',
-            'Heart Rate': 'heart_rate',
-            'PaCO2': 'paco2',
-            'Creatinine': 'creatinine',
-            'pH': 'ph'
-        }
+        df = self._prepare_silver_frame(pd.read_sql(self._build_silver_query(), self.engine))
         
-        # Rename columns that exist
-        for old_name, new_name in column_mapping.items():
-            if old_name in pivoted.columns:
-                pivoted = pivoted.rename(columns={old_name: new_name})
+        self.logger.info("Aggregated {} measurements into {} patient records".format(
+            self.stats['measurements_processed'], len(df)
+        ))
+        return df
+    
+    def iter_silver_batches(self, batch_size):
+        """Stream the per-stay Silver aggregation in batches through a server-side cursor"""
+        self.logger.info("Streaming aggregated Silver data in batches of {}...".format(batch_size))
         
-        self.logger.info("Created {} patient records for gold calculation".format(len(pivoted)))
-        return pivoted
+        with self.engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(self._build_silver_query(), conn, chunksize=batch_size):
+                yield self._prepare_silver_frame(chunk)
     
     def calculate_simplified_scores(self, df):
         """Calculate simplified clinical scores"""
         self.logger.info("Calculating simplified clinical scores...")
         
-        # Initialize scores
-        df['apache_ii_score'] = 0
-        df['sofa_score'] = 0
-        df['saps_ii_score'] = 0
-        df['oasis_score'] = 0
-        
-        # Simplified APACHE-II calculation
-        if 'heart_rate' in df.columns:
-            df['apache_ii_score'] += np.where(df['heart_rate'] > 150, 4,
-                                     np.where(df['heart_rate'] > 110, 2, 0))
-        
-        if 'respiratory_rate' in df.columns:
-            df['apache_ii_score'] += np.where(df['respiratory_rate'] > 35, 4,
-                                     np.where(df['respiratory_rate'] > 25, 1, 0))
-        
-        if 'creatinine' in df.columns:
-            df['apache_ii_score'] += np.where(df['creatinine'] > 3.5, 4,
-                                     np.where(df['creatinine'] > 2.0, 3, 
-                                     np.where(df['creatinine'] > 1.2, 2, 0)))
-        
-        # Simplified SOFA calculation
-        if 'respiratory_rate' in df.columns:
-            df['sofa_score'] += np.where(df['respiratory_rate'] > 30, 2,
-                               np.where(df['respiratory_rate'] > 25, 1, 0))
-        
-        if 'heart_rate' in df.columns:
-            df['sofa_score'] += np.where(df['heart_rate'] > 120, 2, 0)
-        
-        if 'creatinine' in df.columns:
-            df['sofa_score'] += np.where(df['creatinine'] > 5.0, 4,
-                               np.where(df['creatinine'] > 3.5, 3,
-                               np.where(df['creatinine'] > 2.0, 2,
-                               np.where(df['creatinine'] > 1.2, 1, 0))))
-        
-        # Simplified SAPS-II
-        if 'heart_rate' in df.columns:
-            df['saps_ii_score'] += np.where(df['heart_rate'] > 160, 7,
-                                   np.where(df['heart_rate'] > 120, 4, 0))
+        # Pull each input column out once; heart rate feeds all four scores
+        values = {
+            column: df[column].to_numpy(dtype=float)
+            for column in PARAMETER_COLUMNS if column in df.columns
+        }
         
-        # Simplified OASIS
-        if 'heart_rate' in df.columns:
-            df['oasis_score'] += np.where(df['heart_rate'] > 125, 3, 0)
+        # Accumulate every score into one contiguous int16 block
+        scores = np.zeros((len(df), len(SCORE_LADDERS)), dtype=np.int16)
+        for i, ladders in enumerate(SCORE_LADDERS.values()):
+            for column, thresholds, points in ladders:
+                if column in values:
+                    scores[:, i] += ladder_points(values[column], thresholds, points)
         
-        # Clip scores to reasonable ranges
-        df['apache_ii_score'] = np.clip(df['apache_ii_score'], 0, 71)
-        df['sofa_score'] = np.clip(df['sofa_score'], 0, 24)
-        df['saps_ii_score'] = np.clip(df['saps_ii_score'], 0, 163)
-        df['oasis_score'] = np.clip(df['oasis_score'], 0, 7)
+        # Clip all scores to their valid ranges in one pass
+        np.clip(scores, 0, list(SCORE_MAXIMUMS.values()), out=scores)
+        df[list(SCORE_LADDERS)] = scores
         
-        self.stats['scores_calculated'] = len(df)
+        self.stats['scores_calculated'] += len(df)
         self.logger.info("Calculated scores for {} records".format(len(df)))
         
         return df
@@ -204,98 +282,145 @@ class GoldETLPipeline:
         """Prepare final dataset for insertion"""
         self.logger.info("Preparing output data...")
         
-        # Add configuration metadata
-        df['config_name'] = self.config['name']
-        df['aggregation_method'] = self.config['aggregation_method']
-        df['imputation_method'] = self.config['imputation_method']
-        df['outlier_handling'] = self.config['outlier_handling']
-        df['time_window_hours'] = self.config['time_window_hours']
-        
-        # Add timing information
-        df['measurement_time'] = df['charttime']
-        df['calculation_time'] = datetime.now()
-        df['created_at'] = datetime.now()
-        df['updated_at'] = datetime.now()
+        # Add configuration metadata and timing information in one pass
+        now = datetime.now()
+        df = df.assign(
+            config_name=self.config.name,
+            aggregation_method=self.config.aggregation_method,
+            imputation_method=self.config.imputation_method,
+            outlier_handling=self.config.outlier_handling,
+            time_window_hours=self.config.time_window_hours,
+            measurement_time=df['charttime'],
+            calculation_time=now,
+            created_at=now,
+            updated_at=now
+        )
         
         # Rename for output schema
         df = df.rename(columns={'subject_id': 'patient_id'})
         
-        # Add quality metrics
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        df['total_parameters_used'] = df[numeric_cols].notna().sum(axis=1)
-        df['missing_parameters'] = 25 - df['total_parameters_used']  # Assuming 25 total possible
-        df['data_quality_score'] = df['total_parameters_used'] / 25.0
+        # Add quality metrics from the score input columns only
+        parameters = df.reindex(columns=PARAMETER_COLUMNS).to_numpy(dtype=np.float32)
+        used = np.count_nonzero(~np.isnan(parameters), axis=1)
+        df['total_parameters_used'] = used
+        df['missing_parameters'] = TOTAL_PARAMETERS - used
+        df['data_quality_score'] = used / float(TOTAL_PARAMETERS)
         df['imputed_parameters'] = 0  # Simplified
         
-        # Select final columns for output
-        output_columns = [
-            'patient_id', 'hadm_id', 'stay_id', 'measurement_time', 'calculation_time',
-            'config_name', 'aggregation_method', 'imputation_method', 'outlier_handling',
-            'time_window_hours', 'apache_ii_score', 'sofa_score', 'saps_ii_score', 'oasis_score',
-            'total_parameters_used', 'missing_parameters', 'imputed_parameters',
-            'data_quality_score', 'created_at', 'updated_at'
-        ]
-        
-        # Add any parameter columns that exist
-        parameter_columns = ['respiratory_rate', 'heart_rate', 'paco2', 'creatinine', 'ph']
-        for col in parameter_columns:
-            if col in df.columns:
-                output_columns.insert(-6, col)  # Insert before the last 6 metadata columns
+        # Fill missing required columns with NULL on this batch's own frame,
+        # so the output selection below needs no separate copy
+        for col in OUTPUT_COLUMNS:
+            if col not in df.columns:
+                df[col] = None
         
-        # Only include columns that exist
-        available_columns = [col for col in output_columns if col in df.columns]
-        df_output = df[available_columns].copy()
+        self.patient_ids.update(df['patient_id'].unique())
+        self.stats['patients_processed'] = len(self.patient_ids)
         
-        # Fill missing required columns with NULL
-        for col in output_columns:
-            if col not in df_output.columns:
-                df_output[col] = None
-        
-        self.stats['patients_processed'] = df_output['patient_id'].nunique()
-        
-        self.logger.info("Prepared {} records for output".format(len(df_output)))
-        return df_output[output_columns]
+        self.logger.info("Prepared {} records for output".format(len(df)))
+        return df[OUTPUT_COLUMNS]
+    
+    def _delete_query(self):
+        """DELETE statement clearing this configuration's rows, with config_name bound"""
+        query = "DELETE FROM gold.{} WHERE config_name = %(config_name)s".format(
+            self.config.output_table
+        )
+        return query, {'config_name': self.config.name}
     
-    def write_to_gold(self, df):
-        """Write results to gold layer table"""
-        table_name = self.config['output_table']
+    def write_to_gold(self, df, method='copy'):
+        """Write results to gold layer table (COPY by default, batched to_sql otherwise)"""
+        if method == 'copy':
+            return self.write_batches_to_gold([df])
+        
+        table_name = self.config.output_table
         self.logger.info("Writing results to gold.{}...".format(table_name))
         
         # Clear existing data for this configuration
-        with self.engine.connect() as conn:
-            delete_query = "DELETE FROM gold.{} WHERE config_name = '{}'".format(
-                table_name, self.config['name']
-            )
-            conn.execute(text(delete_query))
-            conn.commit()
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(*self._delete_query())
         
-        # Write new data
+        # Write new data; method=None is executemany, batched by ENGINE_OPTIONS
         df.to_sql(
             table_name,
             self.engine,
             schema='gold',
             if_exists='append',
             index=False,
-            method='multi'
+            method=None
         )
         
         self.logger.info("Successfully wrote {} records to gold.{}".format(
             len(df), table_name
         ))
+        return len(df)
+    
+    def write_batches_to_gold(self, batches):
+        """COPY every batch into an unlogged staging table, then swap this config's rows in one transaction"""
+        table_name = self.config.output_table
+        staging_table = "{}_staging".format(table_name)
+        column_list = ', '.join(OUTPUT_COLUMNS)
+        self.logger.info("Writing results to gold.{}...".format(table_name))
+        
+        rows_written = 0
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "CREATE UNLOGGED TABLE IF NOT EXISTS gold.{} AS SELECT {} FROM gold.{} WITH NO DATA".format(
+                    staging_table, column_list, table_name
+                )
+            )
+            cursor.execute("TRUNCATE gold.{}".format(staging_table))
+            for df in batches:
+                self._copy_to_gold(cursor, df, staging_table)
+                rows_written += len(df)
+            
+            # Swap: the gold table is only locked for the final DELETE + INSERT
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_{0}_config_name ON gold.{0} (config_name)".format(table_name))
+            cursor.execute(*self._delete_query())
+            cursor.execute("INSERT INTO gold.{} ({}) SELECT {} FROM gold.{}".format(
+                table_name, column_list, column_list, staging_table
+            ))
+            cursor.execute("TRUNCATE gold.{}".format(staging_table))
+            cursor.close()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        self.logger.info("Successfully wrote {} records to gold.{}".format(
+            rows_written, table_name
+        ))
+        return rows_written
+    
+    def _copy_to_gold(self, cursor, df, table_name):
+        """Stream one DataFrame into a gold schema table with COPY FROM STDIN"""
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        
+        copy_query = "COPY gold.{} ({}) FROM STDIN WITH (FORMAT csv)".format(
+            table_name, ', '.join(df.columns)
+        )
+        cursor.copy_expert(copy_query, buffer)
     
-    def run_pipeline(self):
-        """Execute complete ETL pipeline"""
+    def run_pipeline(self, batch_size=BATCH_CONFIG['batch_size'], create_indexes=True):
+        """Execute complete ETL pipeline, streaming Silver stays in batches"""
         start_time = datetime.now()
-        self.logger.info("Starting Gold ETL Pipeline: {}".format(self.config['name']))
+        self.logger.info("Starting Gold ETL Pipeline: {}".format(self.config.name))
         self.logger.info("=" * 60)
         
         try:
+            if create_indexes:
+                ensure_indexes(self.engine, self.logger)
+            
             # ETL Steps
-            df = self.load_silver_data()
-            df = self.prepare_for_gold_calculation(df)
-            df = self.calculate_simplified_scores(df)
-            df = self.prepare_output_data(df)
-            self.write_to_gold(df)
+            batches = (
+                self.prepare_output_data(self.calculate_simplified_scores(df))
+                for df in self.iter_silver_batches(batch_size)
+            )
+            self.write_batches_to_gold(batches)
             
             # Final report
             duration = datetime.now() - start_time
@@ -305,7 +430,7 @@ class GoldETLPipeline:
             self.logger.info("Patients processed: {}".format(self.stats['patients_processed']))
             self.logger.info("Measurements processed: {}".format(self.stats['measurements_processed']))
             self.logger.info("Scores calculated: {}".format(self.stats['scores_calculated']))
-            self.logger.info("Output table: gold.{}".format(self.config['output_table']))
+            self.logger.info("Output table: gold.{}".format(self.config.output_table))
             
             return True
             
@@ -313,15 +438,31 @@ class GoldETLPipeline:
             self.logger.error("ETL Pipeline failed: {}".format(e))
             raise
 
-def run_etl_pipeline(config):
+def run_etl_pipeline(config, create_indexes=True):
     """Main function to run ETL pipeline with given configuration"""
     pipeline = GoldETLPipeline(config)
-    return pipeline.run_pipeline()
+    return pipeline.run_pipeline(create_indexes=create_indexes)
+
+def run_etl_pipelines(configs=(CONFIG_1, CONFIG_2)):
+    """Run the ETL pipeline for several configurations in parallel worker processes"""
+    # Create the shared Silver index once up front so the workers do not race on it
+    engine = create_engine(connection_string(), **ENGINE_OPTIONS)
+    ensure_indexes(engine)
+    engine.dispose()
+    
+    # Each worker opens its own engine; the configs write to separate tables.
+    # GoldConfig pickles, the read-only config mappings do not.
+    configs = [GoldConfig.from_dict(config) for config in configs]
+    with ProcessPoolExecutor(max_workers=len(configs)) as executor:
+        return all(executor.map(functools.partial(run_etl_pipeline, create_indexes=False), configs))
 
 if __name__ == "__main__":
-    # Test with active configuration
+    # Test with active configuration, or both configurations with --all
     try:
-        success = run_etl_pipeline(ACTIVE_CONFIG)
+        if '--all' in sys.argv:
+            success = run_etl_pipelines()
+        else:
+            success = run_etl_pipeline(ACTIVE_CONFIG)
         if success:
             print("ETL Pipeline completed successfully")
         else:
@@ -20,21 +20,147 @@ Date: 2025-06-04
 import pandas as pd
 import numpy as np
 import psycopg2
+from psycopg2.extras import execute_values
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta
 import logging
+import re
 import sys
 from pathlib import Path
 
 # Import configurations
 from config_local import DB_CONFIG
 
+BRONZE_COLUMNS = (
+    "subject_id, hadm_id, stay_id, itemid, charttime, value, valuenum, valueuom, "
+    "label, category, source_table, is_sofa_parameter, sofa_system"
+)
+
+# Clinical range rules for discovered parameters, matched against upper-cased labels
+OMOP_RANGE_RULES = (
+    (re.compile(r'PAO2'), 50, 500, 'mmHg'),
+    (re.compile(r'SPO2|OXYGEN SAT'), 70, 100, '%'),
+    (re.compile(r'PLATELET|PLT'), 10, 1000, 'K/uL'),
+    (re.compile(r'CREATININE'), 0.3, 15, 'mg/dL'),
+    (re.compile(r'BILIRUBIN'), 0.1, 50, 'mg/dL'),
+    (re.compile(r'GCS|GLASGOW'), 3, 15, 'score'),
+    (re.compile(r'PRESSURE|MAP'), 20, 200, 'mmHg'),
+    (re.compile(r'URINE.*OUTPUT|OUTPUT.*URINE'), 0, 5000, 'mL'),
+)
+OMOP_DEFAULT_RANGE = (None, 0, 1000000, 'unit')  # Default wide range
+
+BRONZE_STAGE_SCHEMA = "bronze_stage"
+
+SOFA_SYSTEMS = ('respiratory', 'cardiovascular', 'coagulation', 'liver', 'cns', 'renal')
+
+# Lets the lab extraction resolve each result's ICU stay with an index-only probe
+ICU_STAY_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_icustays_subject_intime
+ON mimiciv_icu.icustays (subject_id, intime) INCLUDE (outtime, stay_id)
+"""
+
+# Per-source extraction, each joined to its itemid → SOFA system lookup
+BRONZE_SOURCE_SQL = {
+    'chartevents': """
+SELECT
+    ce.subject_id, ce.hadm_id, ce.stay_id, ce.itemid, ce.charttime,
+    ce.value, ce.valuenum, ce.valueuom, di.label, di.category,
+    'chartevents'::VARCHAR(50) AS source_table, TRUE AS is_sofa_parameter, m.sofa_system
+FROM mimiciv_icu.chartevents ce
+JOIN unnest(%(itemids)s::int[], %(systems)s::text[]) AS m(itemid, sofa_system) ON m.itemid = ce.itemid
+JOIN mimiciv_icu.d_items di ON ce.itemid = di.itemid
+WHERE ce.valuenum IS NOT NULL
+  AND ce.stay_id IS NOT NULL
+""",
+    'labevents': """
+SELECT
+    le.subject_id, le.hadm_id, icu.stay_id, le.itemid, le.charttime,
+    le.value, le.valuenum, le.valueuom, dl.label, dl.category,
+    'labevents'::VARCHAR(50) AS source_table, TRUE AS is_sofa_parameter, m.sofa_system
+FROM mimiciv_hosp.labevents le
+JOIN unnest(%(itemids)s::int[], %(systems)s::text[]) AS m(itemid, sofa_system) ON m.itemid = le.itemid
+JOIN mimiciv_hosp.d_labitems dl ON le.itemid = dl.itemid
+JOIN LATERAL (
+    SELECT stay_id
+    FROM mimiciv_icu.icustays
+    WHERE subject_id = le.subject_id
+      AND intime <= le.charttime
+      AND outtime >= le.charttime
+) icu ON TRUE
+WHERE le.valuenum IS NOT NULL
+""",
+    'outputevents': """
+SELECT
+    oe.subject_id, oe.hadm_id, oe.stay_id, oe.itemid, oe.charttime,
+    oe.value, oe.valuenum, oe.valueuom, di.label, di.category,
+    'outputevents'::VARCHAR(50) AS source_table, TRUE AS is_sofa_parameter, m.sofa_system
+FROM mimiciv_icu.outputevents oe
+JOIN unnest(%(itemids)s::int[], %(systems)s::text[]) AS m(itemid, sofa_system) ON m.itemid = oe.itemid
+JOIN mimiciv_icu.d_items di ON oe.itemid = di.itemid
+WHERE oe.value IS NOT NULL
+  AND oe.stay_id IS NOT NULL
+""",
+}
+
+SILVER_INSERT_SQL = """
+INSERT INTO silver.collection_disease_std_corrected
+(subject_id, hadm_id, stay_id, concept_id, concept_name, charttime, value, valueuom,
+ standard_unit, is_outlier, sofa_system, original_itemid, source_table, conversion_factor)
+SELECT
+    b.subject_id,
+    b.hadm_id,
+    b.stay_id,
+    m.concept_id,
+    m.concept_name,
+    b.charttime,
+    b.valuenum * m.conversion_factor,
+    b.valueuom,
+    m.standard_unit,
+    FALSE,  -- out-of-range values never reach silver, see the BETWEEN filter
+    b.sofa_system,
+    b.itemid,
+    b.source_table,
+    m.conversion_factor
+FROM bronze.collection_disease_corrected b
+JOIN concept_map m ON b.itemid = m.source_itemid
+WHERE b.valuenum IS NOT NULL
+  AND b.valuenum BETWEEN m.min_value AND m.max_value
+"""
+
+BRONZE_INDEXES_SQL = """
+CREATE INDEX idx_bronze_subject ON bronze.collection_disease_corrected (subject_id);
+CREATE INDEX idx_bronze_stay ON bronze.collection_disease_corrected (stay_id);
+CREATE INDEX idx_bronze_time ON bronze.collection_disease_corrected (charttime);
+CREATE INDEX idx_bronze_item ON bronze.collection_disease_corrected (itemid);
+CREATE INDEX idx_bronze_sofa ON bronze.collection_disease_corrected (is_sofa_parameter);
+"""
+
+SILVER_INDEXES_SQL = """
+CREATE INDEX idx_silver_subject ON silver.collection_disease_std_corrected (subject_id);
+CREATE INDEX idx_silver_stay ON silver.collection_disease_std_corrected (stay_id);
+CREATE INDEX idx_silver_concept ON silver.collection_disease_std_corrected (concept_id);
+CREATE INDEX idx_silver_time ON silver.collection_disease_std_corrected (charttime);
+CREATE INDEX idx_silver_sofa ON silver.collection_disease_std_corrected (sofa_system);
+"""
+
+def _sofa_partitions_sql(parent, prefix):
+    """DDL for one LIST partition per SOFA system plus a default partition"""
+    statements = [
+        f"CREATE TABLE {prefix}_{system} PARTITION OF {parent} FOR VALUES IN ('{system}');"
+        for system in SOFA_SYSTEMS
+    ]
+    statements.append(f"CREATE TABLE {prefix}_other PARTITION OF {parent} DEFAULT;")
+    return '\n'.join(statements)
+
 class PipelineRebuilder:
     """Comprehensive pipeline rebuilder with validation"""
     
     def __init__(self):
         self.logger = self._setup_logging()
         self.conn = psycopg2.connect(**DB_CONFIG)
+        self.cur = self.conn.cursor()  # shared by every phase of the rebuild
         self.engine = create_engine(f"postgresql://{DB_CONFIG['user']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
         
         # Statistics tracking
@@ -67,6 +193,22 @@ class PipelineRebuilder:
         
         return logger
 
+    def _create_indexes(self, cur, indexes_sql):
+        """Build indexes on a freshly loaded table with parallel maintenance workers"""
+        cur.execute("SET LOCAL max_parallel_maintenance_workers = 4")
+        cur.execute(indexes_sql)
+
+    def _scan_items(self, table_name, query, params):
+        """Stream an item aggregation through a server-side cursor into a frame"""
+        with self.conn.cursor(name=f'{table_name}_scan') as cur:
+            cur.itersize = 10_000
+            cur.execute(query, params)
+            items = pd.DataFrame.from_records(
+                iter(cur), columns=['itemid', 'label', 'category', 'measurement_count']
+            )
+        items['table'] = table_name
+        return items
+
     def analyze_raw_mimic_data(self):
         """Analyze raw MIMIC-IV data to identify SOFA parameters"""
         self.logger.info("🔍 Analyzing raw MIMIC-IV data for SOFA parameters...")
@@ -105,74 +247,73 @@ class PipelineRebuilder:
             }
         }
         
+        # Only candidate labels reach the fact-table aggregation
+        label_patterns = [
+            f"%{term}%"
+            for params in sofa_parameters.values()
+            for term in params['search_terms']
+        ]
+        
         # Search in chartevents
         self.logger.info("📊 Searching chartevents for SOFA parameters...")
-        cur = self.conn.cursor()
-        
-        cur.execute("""
-            SELECT DISTINCT di.itemid, di.label, di.category, COUNT(*) as measurement_count
-            FROM mimiciv_icu.chartevents ce
-            JOIN mimiciv_icu.d_items di ON ce.itemid = di.itemid
+        chartevents_items = self._scan_items('chartevents', """
+            SELECT di.itemid, di.label, di.category, COUNT(*) as measurement_count
+            FROM mimiciv_icu.d_items di
+            JOIN mimiciv_icu.chartevents ce ON ce.itemid = di.itemid
+            WHERE di.label ILIKE ANY(%s)
             GROUP BY di.itemid, di.label, di.category
             ORDER BY measurement_count DESC
-        """)
-        
-        chartevents_items = cur.fetchall()
-        self.logger.info(f"📈 Found {len(chartevents_items)} unique chart items")
+        """, (label_patterns,))
+        self.logger.info(f"📈 Found {len(chartevents_items)} candidate chart items")
         
         # Search in labevents
         self.logger.info("🧪 Searching labevents for SOFA parameters...")
-        cur.execute("""
-            SELECT DISTINCT dl.itemid, dl.label, dl.category, COUNT(*) as measurement_count
-            FROM mimiciv_hosp.labevents le
-            JOIN mimiciv_hosp.d_labitems dl ON le.itemid = dl.itemid
+        labevents_items = self._scan_items('labevents', """
+            SELECT dl.itemid, dl.label, dl.category, COUNT(*) as measurement_count
+            FROM mimiciv_hosp.d_labitems dl
+            JOIN mimiciv_hosp.labevents le ON le.itemid = dl.itemid
+            WHERE dl.label ILIKE ANY(%s)
             GROUP BY dl.itemid, dl.label, dl.category
             ORDER BY measurement_count DESC
-        """)
-        
-        labevents_items = cur.fetchall()
-        self.logger.info(f"🧪 Found {len(labevents_items)} unique lab items")
+        """, (label_patterns,))
+        self.logger.info(f"🧪 Found {len(labevents_items)} candidate lab items")
         
         # Search in outputevents  
         self.logger.info("💧 Searching outputevents for SOFA parameters...")
-        cur.execute("""
-            SELECT DISTINCT di.itemid, di.label, di.category, COUNT(*) as measurement_count
-            FROM mimiciv_icu.outputevents oe
-            JOIN mimiciv_icu.d_items di ON oe.itemid = di.itemid
+        outputevents_items = self._scan_items('outputevents', """
+            SELECT di.itemid, di.label, di.category, COUNT(*) as measurement_count
+            FROM mimiciv_icu.d_items di
+            JOIN mimiciv_icu.outputevents oe ON oe.itemid = di.itemid
+            WHERE di.label ILIKE ANY(%s)
             GROUP BY di.itemid, di.label, di.category
             ORDER BY measurement_count DESC
-        """)
-        
-        outputevents_items = cur.fetchall()
-        self.logger.info(f"💧 Found {len(outputevents_items)} unique output items")
+        """, (label_patterns,))
+        self.logger.info(f"💧 Found {len(outputevents_items)} candidate output items")
         
         # Match items to SOFA parameters
-        all_items = [
-            ('chartevents', chartevents_items),
-            ('labevents', labevents_items), 
-            ('outputevents', outputevents_items)
-        ]
+        items = pd.concat([chartevents_items, labevents_items, outputevents_items], ignore_index=True)
+        label_upper = items['label'].str.upper()
         
         for system, params in sofa_parameters.items():
             self.logger.info(f"\n🎯 Searching for {system.upper()} parameters:")
             
-            for table_name, items in all_items:
-                for itemid, label, category, count in items:
-                    label_upper = label.upper()
-                    
-                    # Check if any search term matches this item
-                    for term in params['search_terms']:
-                        if term.upper() in label_upper:
-                            match_info = {
-                                'table': table_name,
-                                'itemid': itemid,
-                                'label': label,
-                                'category': category,
-                                'count': count,
-                                'search_term': term
-                            }
-                            params['found_items'].append(match_info)
-                            self.logger.info(f"   ✅ {table_name}: {itemid} - {label} ({count:,} measurements)")
+            # One vectorized pass per term; a stable sort on the row index
+            # restores table/item order with terms in declaration order
+            hits = pd.concat([
+                items[label_upper.str.contains(term.upper(), regex=False, na=False)].assign(search_term=term)
+                for term in params['search_terms']
+            ]).sort_index(kind='stable')
+            
+            for hit in hits.itertuples(index=False):
+                params['found_items'].append({
+                    'table': hit.table,
+                    'itemid': hit.itemid,
+                    'label': hit.label,
+                    'category': hit.category,
+                    'count': hit.measurement_count,
+                    'search_term': hit.search_term
+                })
+                self.logger.info(f"   ✅ {hit.table}: {hit.itemid} - {hit.label} ({hit.measurement_count:,} measurements)")
             
             if not params['found_items']:
                 self.logger.warning(f"   ❌ No {system} parameters found!")
@@ -180,6 +321,13 @@ class PipelineRebuilder:
         
         # Store results for configuration update
         self.sofa_parameter_mapping = sofa_parameters
+        
+        # Group the itemid → SOFA system lookup by source table once; the
+        # first system an itemid was found under wins
+        self._by_table = {table_name: {} for table_name in BRONZE_SOURCE_SQL}
+        for system, params in sofa_parameters.items():
+            for item in params['found_items']:
+                self._by_table[item['table']].setdefault(item['itemid'], system)
         self.stats['sofa_parameters_found'] = {
             system: len(params['found_items']) 
             for system, params in sofa_parameters.items()
@@ -187,15 +335,29 @@ class PipelineRebuilder:
         
         return sofa_parameters
 
+    def _extract_source(self, table_name, items):
+        """Extract one source table into an unlogged stage on its own connection"""
+        self.logger.info(f"📊 Extracting {len(items)} {table_name} SOFA items...")
+        with closing(psycopg2.connect(**DB_CONFIG)) as conn:
+            with conn, conn.cursor() as cur:
+                cur.execute("SET LOCAL synchronous_commit = off")
+                cur.execute("SET LOCAL work_mem = '512MB'")
+                cur.execute(f"DROP TABLE IF EXISTS {BRONZE_STAGE_SCHEMA}.{table_name}")
+                cur.execute(
+                    f"CREATE UNLOGGED TABLE {BRONZE_STAGE_SCHEMA}.{table_name} AS "
+                    + BRONZE_SOURCE_SQL[table_name],
+                    {'itemids': list(items), 'systems': list(items.values())}
+                )
+                return cur.rowcount
+
     def create_corrected_bronze_layer(self):
         """Create Bronze layer with correct SOFA parameter extraction"""
         self.logger.info("🥉 Creating corrected Bronze layer...")
         
         # Drop and recreate bronze schema
-        cur = self.conn.cursor()
+        cur = self.cur
         cur.execute("DROP SCHEMA IF EXISTS bronze CASCADE")
         cur.execute("CREATE SCHEMA bronze")
-        self.conn.commit()
         
         # Create bronze table with proper structure
         bronze_sql = """
@@ -214,147 +376,49 @@ class PipelineRebuilder:
             is_sofa_parameter BOOLEAN DEFAULT FALSE,
             sofa_system VARCHAR(50),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        
-        CREATE INDEX idx_bronze_subject ON bronze.collection_disease_corrected (subject_id);
-        CREATE INDEX idx_bronze_stay ON bronze.collection_disease_corrected (stay_id);
-        CREATE INDEX idx_bronze_time ON bronze.collection_disease_corrected (charttime);
-        CREATE INDEX idx_bronze_item ON bronze.collection_disease_corrected (itemid);
-        CREATE INDEX idx_bronze_sofa ON bronze.collection_disease_corrected (is_sofa_parameter);
+        ) PARTITION BY LIST (sofa_system);
         """
         
         cur.execute(bronze_sql)
-        self.conn.commit()
+        cur.execute(_sofa_partitions_sql('bronze.collection_disease_corrected', 'bronze.cd'))
         
-        # Extract SOFA parameters from each source table
-        total_records = 0
+        sofa_map = {table_name: items for table_name, items in self._by_table.items() if items}
         
-        # Extract from chartevents
-        self.logger.info("📊 Extracting chartevents SOFA parameters...")
-        sofa_itemids = []
-        for system, params in self.sofa_parameter_mapping.items():
-            for item in params['found_items']:
-                if item['table'] == 'chartevents':
-                    sofa_itemids.append((item['itemid'], system))
-        
-        if sofa_itemids:
-            itemid_list = ','.join([str(itemid) for itemid, _ in sofa_itemids])
-            insert_sql = f"""
-            INSERT INTO bronze.collection_disease_corrected 
-            (subject_id, hadm_id, stay_id, itemid, charttime, value, valuenum, valueuom, label, category, source_table, is_sofa_parameter, sofa_system)
-            SELECT 
-                ce.subject_id,
-                ce.hadm_id,
-                ce.stay_id,
-                ce.itemid,
-                ce.charttime,
-                ce.value,
-                ce.valuenum,
-                ce.valueuom,
-                di.label,
-                di.category,
-                'chartevents',
-                TRUE,
-                CASE ce.itemid
-                    {' '.join([f"WHEN {itemid} THEN '{system}'" for itemid, system in sofa_itemids])}
-                END
-            FROM mimiciv_icu.chartevents ce
-            JOIN mimiciv_icu.d_items di ON ce.itemid = di.itemid
-            WHERE ce.itemid IN ({itemid_list})
-              AND ce.valuenum IS NOT NULL
-              AND ce.stay_id IS NOT NULL
-            """
-            
-            cur.execute(insert_sql)
-            chart_records = cur.rowcount
-            total_records += chart_records
-            self.logger.info(f"   ✅ Extracted {chart_records:,} chartevents records")
-        
-        # Extract from labevents  
-        self.logger.info("🧪 Extracting labevents SOFA parameters...")
-        lab_itemids = []
-        for system, params in self.sofa_parameter_mapping.items():
-            for item in params['found_items']:
-                if item['table'] == 'labevents':
-                    lab_itemids.append((item['itemid'], system))
-        
-        if lab_itemids:
-            itemid_list = ','.join([str(itemid) for itemid, _ in lab_itemids])
-            insert_sql = f"""
-            INSERT INTO bronze.collection_disease_corrected 
-            (subject_id, hadm_id, stay_id, itemid, charttime, value, valuenum, valueuom, label, category, source_table, is_sofa_parameter, sofa_system)
-            SELECT 
-                le.subject_id,
-                le.hadm_id,
-                icu.stay_id,
-                le.itemid,
-                le.charttime,
-                le.value,
-                le.valuenum,
-                le.valueuom,
-                dl.label,
-                dl.category,
-                'labevents',
-                TRUE,
-                CASE le.itemid
-                    {' '.join([f"WHEN {itemid} THEN '{system}'" for itemid, system in lab_itemids])}
-                END
-            FROM mimiciv_hosp.labevents le
-            JOIN mimiciv_hosp.d_labitems dl ON le.itemid = dl.itemid
-            JOIN mimiciv_icu.icustays icu ON le.subject_id = icu.subject_id 
-                AND le.charttime >= icu.intime 
-                AND le.charttime <= icu.outtime
-            WHERE le.itemid IN ({itemid_list})
-              AND le.valuenum IS NOT NULL
-            """
+        # Extract each source concurrently into its own unlogged stage; the
+        # stage schema is committed separately so worker sessions can see it
+        total_records = 0
+        if sofa_map:
+            with closing(psycopg2.connect(**DB_CONFIG)) as conn:
+                conn.autocommit = True
+                setup = conn.cursor()
+                setup.execute(f"CREATE SCHEMA IF NOT EXISTS {BRONZE_STAGE_SCHEMA}")
+                if 'labevents' in sofa_map:
+                    # Best-effort: read-only MIMIC roles still probe icustays (~70k rows) without it
+                    try:
+                        setup.execute(ICU_STAY_INDEX_SQL)
+                    except psycopg2.Error as e:
+                        self.logger.warning(f"⚠️ Could not create icustays lookup index: {e}")
             
-            cur.execute(insert_sql)
-            lab_records = cur.rowcount  
-            total_records += lab_records
-            self.logger.info(f"   ✅ Extracted {lab_records:,} labevents records")
-        
-        # Extract from outputevents
-        self.logger.info("💧 Extracting outputevents SOFA parameters...")
-        output_itemids = []
-        for system, params in self.sofa_parameter_mapping.items():
-            for item in params['found_items']:
-                if item['table'] == 'outputevents':
-                    output_itemids.append((item['itemid'], system))
-        
-        if output_itemids:
-            itemid_list = ','.join([str(itemid) for itemid, _ in output_itemids])
-            insert_sql = f"""
-            INSERT INTO bronze.collection_disease_corrected 
-            (subject_id, hadm_id, stay_id, itemid, charttime, value, valuenum, valueuom, label, category, source_table, is_sofa_parameter, sofa_system)
-            SELECT 
-                oe.subject_id,
-                oe.hadm_id,
-                oe.stay_id,
-                oe.itemid,
-                oe.charttime,
-                oe.value,
-                oe.valuenum,
-                oe.valueuom,
-                di.label,
-                di.category,
-                'outputevents',
-                TRUE,
-                CASE oe.itemid
-                    {' '.join([f"WHEN {itemid} THEN '{system}'" for itemid, system in output_itemids])}
-                END
-            FROM mimiciv_icu.outputevents oe
-            JOIN mimiciv_icu.d_items di ON oe.itemid = di.itemid
-            WHERE oe.itemid IN ({itemid_list})
-              AND oe.value IS NOT NULL
-              AND oe.stay_id IS NOT NULL
-            """
+            with ThreadPoolExecutor(max_workers=len(sofa_map)) as executor:
+                futures = {
+                    executor.submit(self._extract_source, table_name, items): table_name
+                    for table_name, items in sofa_map.items()
+                }
+                for future in as_completed(futures):
+                    source_records = future.result()
+                    total_records += source_records
+                    self.logger.info(f"   ✅ Extracted {source_records:,} {futures[future]} records")
             
-            cur.execute(insert_sql)
-            output_records = cur.rowcount
-            total_records += output_records
-            self.logger.info(f"   ✅ Extracted {output_records:,} outputevents records")
+            self.logger.info("📦 Loading staged records into Bronze table...")
+            cur.execute(f"""
+            INSERT INTO bronze.collection_disease_corrected
+            ({BRONZE_COLUMNS})
+            {' UNION ALL '.join(f'SELECT {BRONZE_COLUMNS} FROM {BRONZE_STAGE_SCHEMA}.{table_name}' for table_name in sofa_map)}
+            """)
+            cur.execute(f"DROP SCHEMA {BRONZE_STAGE_SCHEMA} CASCADE")
         
-        self.conn.commit()
+        self._create_indexes(cur, BRONZE_INDEXES_SQL)
+        cur.execute("ANALYZE bronze.collection_disease_corrected")
         self.stats['bronze_records_created'] = total_records
         self.logger.info(f"🥉 Bronze layer created with {total_records:,} SOFA-relevant records")
         
@@ -365,10 +429,9 @@ class PipelineRebuilder:
         self.logger.info("🥈 Creating corrected Silver layer...")
         
         # Drop and recreate silver schema
-        cur = self.conn.cursor()
+        cur = self.cur
         cur.execute("DROP SCHEMA IF EXISTS silver CASCADE")
         cur.execute("CREATE SCHEMA silver")
-        self.conn.commit()
         
         # Create silver table
         silver_sql = """
@@ -390,17 +453,11 @@ class PipelineRebuilder:
             conversion_factor NUMERIC DEFAULT 1.0,
             quality_score NUMERIC DEFAULT 1.0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        
-        CREATE INDEX idx_silver_subject ON silver.collection_disease_std_corrected (subject_id);
-        CREATE INDEX idx_silver_stay ON silver.collection_disease_std_corrected (stay_id);
-        CREATE INDEX idx_silver_concept ON silver.collection_disease_std_corrected (concept_id);
-        CREATE INDEX idx_silver_time ON silver.collection_disease_std_corrected (charttime);
-        CREATE INDEX idx_silver_sofa ON silver.collection_disease_std_corrected (sofa_system);
+        ) PARTITION BY LIST (sofa_system);
         """
         
         cur.execute(silver_sql)
-        self.conn.commit()
+        cur.execute(_sofa_partitions_sql('silver.collection_disease_std_corrected', 'silver.cds'))
         
         # Create OMOP concept mapping based on found parameters
         concept_mapping = self._create_omop_mapping()
@@ -408,51 +465,47 @@ class PipelineRebuilder:
         # Process Bronze → Silver transformation
         self.logger.info("🔄 Processing Bronze → Silver transformation...")
         
-        for concept_id, mapping_info in concept_mapping.items():
-            itemids = mapping_info['source_itemids']
-            if not itemids:
-                continue
-                
-            itemid_list = ','.join(map(str, itemids))
+        concept_rows = [
+            (concept_id, mapping_info['concept_name'], mapping_info['standard_unit'], itemid,
+             mapping_info['min_value'], mapping_info['max_value'],
+             mapping_info.get('conversion_factor', 1.0), mapping_info['sofa_system'])
+            for concept_id, mapping_info in concept_mapping.items()
+            for itemid in mapping_info['source_itemids']
+        ]
+        
+        if concept_rows:
+            cur.execute("""
+            CREATE TEMP TABLE concept_map (
+                concept_id INTEGER NOT NULL,
+                concept_name VARCHAR(200) NOT NULL,
+                standard_unit VARCHAR(50),
+                source_itemid INTEGER NOT NULL,
+                min_value NUMERIC NOT NULL,
+                max_value NUMERIC NOT NULL,
+                conversion_factor NUMERIC NOT NULL,
+                sofa_system VARCHAR(50)
+            ) ON COMMIT DROP
+            """)
+            execute_values(cur, "INSERT INTO concept_map VALUES %s", concept_rows)
+            cur.execute("ANALYZE concept_map")
             
             # Insert with proper unit conversion and quality checks
-            insert_sql = f"""
-            INSERT INTO silver.collection_disease_std_corrected
-            (subject_id, hadm_id, stay_id, concept_id, concept_name, charttime, value, valueuom, 
-             standard_unit, is_outlier, sofa_system, original_itemid, source_table, conversion_factor)
-            SELECT 
-                subject_id,
-                hadm_id, 
-                stay_id,
-                {concept_id},
-                '{mapping_info['concept_name']}',
-                charttime,
-                valuenum * {mapping_info.get('conversion_factor', 1.0)},
-                valueuom,
-                '{mapping_info['standard_unit']}',
-                CASE 
-                    WHEN valuenum < {mapping_info['min_value']} OR valuenum > {mapping_info['max_value']} 
-                    THEN TRUE ELSE FALSE 
-                END,
-                sofa_system,
-                itemid,
-                source_table,
-                {mapping_info.get('conversion_factor', 1.0)}
-            FROM bronze.collection_disease_corrected
-            WHERE itemid IN ({itemid_list})
-              AND valuenum IS NOT NULL
-              AND valuenum BETWEEN {mapping_info['min_value']} AND {mapping_info['max_value']}
-            """
-            
-            cur.execute(insert_sql)
-            records_processed = cur.rowcount
-            self.logger.info(f"   ✅ {mapping_info['concept_name']}: {records_processed:,} records")
+            cur.execute(SILVER_INSERT_SQL)
         
-        self.conn.commit()
+        self._create_indexes(cur, SILVER_INDEXES_SQL)
+        cur.execute("ANALYZE silver.collection_disease_std_corrected")
         
-        # Get final count
-        cur.execute("SELECT COUNT(*) FROM silver.collection_disease_std_corrected")
-        total_silver = cur.fetchone()[0]
+        # Per-concept and final counts
+        cur.execute("""
+            SELECT concept_name, COUNT(*)
+            FROM silver.collection_disease_std_corrected
+            GROUP BY concept_id, concept_name
+            ORDER BY concept_id
+        """)
+        total_silver = 0
+        for concept_name, records_processed in cur.fetchall():
+            total_silver += records_processed
+            self.logger.info(f"   ✅ {concept_name}: {records_processed:,} records")
         self.stats['silver_records_processed'] = total_silver
         self.logger.info(f"🥈 Silver layer created with {total_silver:,} standardized records")
         
@@ -463,50 +516,39 @@ class PipelineRebuilder:
         concept_mapping = {}
         concept_id_counter = 3000000  # Start from 3M to avoid conflicts
         
-        for system, params in self.sofa_parameter_mapping.items():
-            for item in params['found_items']:
-                # Create unique concept for each discovered parameter
-                concept_id = concept_id_counter
-                concept_id_counter += 1
-                
-                # Determine clinical limits based on parameter type
-                if 'PaO2' in item['label'].upper() or 'PAO2' in item['label'].upper():
-                    min_val, max_val = 50, 500
-                    unit = 'mmHg'
-                elif 'SPO2' in item['label'].upper() or 'OXYGEN SAT' in item['label'].upper():
-                    min_val, max_val = 70, 100  
-                    unit = '%'
-                elif 'PLATELET' in item['label'].upper() or 'PLT' in item['label'].upper():
-                    min_val, max_val = 10, 1000
-                    unit = 'K/uL'
-                elif 'CREATININE' in item['label'].upper():
-                    min_val, max_val = 0.3, 15
-                    unit = 'mg/dL'
-                elif 'BILIRUBIN' in item['label'].upper():
-                    min_val, max_val = 0.1, 50
-                    unit = 'mg/dL'
-                elif 'GCS' in item['label'].upper() or 'GLASGOW' in item['label'].upper():
-                    min_val, max_val = 3, 15
-                    unit = 'score'
-                elif 'PRESSURE' in item['label'].upper() or 'MAP' in item['label'].upper():
-                    min_val, max_val = 20, 200
-                    unit = 'mmHg'
-                elif 'URINE' in item['label'].upper() and 'OUTPUT' in item['label'].upper():
-                    min_val, max_val = 0, 5000
-                    unit = 'mL'
-                else:
-                    min_val, max_val = 0, 1000000  # Default wide range
-                    unit = 'unit'
-                
-                concept_mapping[concept_id] = {
-                    'concept_name': item['label'],
-                    'standard_unit': unit,
-                    'source_itemids': [item['itemid']],
-                    'min_value': min_val,
-                    'max_value': max_val,
-                    'sofa_system': system,
-                    'conversion_factor': 1.0
-                }
+        found = [
+            (system, item)
+            for system, params in self.sofa_parameter_mapping.items()
+            for item in params['found_items']
+        ]
+        if not found:
+            return concept_mapping
+        
+        # Determine clinical limits based on parameter type: first matching rule wins
+        labels_upper = pd.Series([item['label'] for _, item in found]).str.upper()
+        rule_index = np.select(
+            [labels_upper.str.contains(pattern).to_numpy() for pattern, *_ in OMOP_RANGE_RULES],
+            np.arange(len(OMOP_RANGE_RULES)),
+            default=len(OMOP_RANGE_RULES)
+        )
+        
+        for (system, item), rule in zip(found, rule_index):
+            # Create unique concept for each discovered parameter
+            concept_id = concept_id_counter
+            concept_id_counter += 1
+            
+            _, min_val, max_val, unit = (OMOP_RANGE_RULES[rule] if rule < len(OMOP_RANGE_RULES)
+                                         else OMOP_DEFAULT_RANGE)
+            
+            concept_mapping[concept_id] = {
+                'concept_name': item['label'],
+                'standard_unit': unit,
+                'source_itemids': [item['itemid']],
+                'min_value': min_val,
+                'max_value': max_val,
+                'sofa_system': system,
+                'conversion_factor': 1.0
+            }
         
         return concept_mapping
 
@@ -522,17 +564,19 @@ class PipelineRebuilder:
             'overall_assessment': 'UNKNOWN'
         }
         
-        cur = self.conn.cursor()
+        cur = self.cur
         
         # Validate raw data coverage
         self.logger.info("📊 Validating raw data coverage...")
-        for system in ['respiratory', 'cardiovascular', 'coagulation', 'liver', 'cns', 'renal']:
-            cur.execute(f"""
-                SELECT COUNT(DISTINCT itemid) 
-                FROM bronze.collection_disease_corrected 
-                WHERE sofa_system = '{system}'
-            """)
-            param_count = cur.fetchone()[0]
+        cur.execute("""
+            SELECT sofa_system, COUNT(DISTINCT itemid)
+            FROM bronze.collection_disease_corrected
+            GROUP BY sofa_system
+        """)
+        bronze_coverage = dict(cur.fetchall())
+        
+        for system in SOFA_SYSTEMS:
+            param_count = bronze_coverage.get(system, 0)
             validation_results['raw_data_coverage'][system] = param_count
             
             if param_count == 0:
@@ -576,50 +620,52 @@ class PipelineRebuilder:
         
         report_path = Path('pipeline_rebuild_report.md')
         
-        with open(report_path, 'w') as f:
-            f.write("# Pipeline Rebuild Report\n\n")
-            f.write(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            
-            f.write("## Executive Summary\n\n")
-            f.write(f"- **Overall Assessment:** {validation_results['overall_assessment']}\n")
-            f.write(f"- **Bronze Records Created:** {self.stats['bronze_records_created']:,}\n")
-            f.write(f"- **Silver Records Processed:** {self.stats['silver_records_processed']:,}\n")
-            f.write(f"- **SOFA Systems Found:** {sum(1 for count in self.stats['sofa_parameters_found'].values() if count > 0)}/6\n\n")
-            
-            f.write("## SOFA Parameter Discovery\n\n")
-            for system, count in self.stats['sofa_parameters_found'].items():
-                status = "✅" if count > 0 else "❌"
-                f.write(f"- **{system.title()}:** {status} {count} parameters found\n")
-            f.write("\n")
-            
-            f.write("## Detailed Parameter Mapping\n\n")
-            for system, params in self.sofa_parameter_mapping.items():
-                f.write(f"### {system.title()} System\n\n")
-                if params['found_items']:
-                    for item in params['found_items']:
-                        f.write(f"- **{item['table']}** - ItemID {item['itemid']}: {item['label']} ({item['count']:,} measurements)\n")
-                else:
-                    f.write("- ❌ No parameters found\n")
-                f.write("\n")
-            
-            f.write("## Data Quality Issues\n\n")
-            if self.stats['data_quality_issues']:
-                for issue in self.stats['data_quality_issues']:
-                    f.write(f"- ⚠️ {issue}\n")
-            else:
-                f.write("- ✅ No major data quality issues detected\n")
-            f.write("\n")
-            
-            f.write("## Recommendations\n\n")
-            if validation_results['overall_assessment'] == 'GOOD':
-                f.write("- ✅ Pipeline is ready for Gold layer SOFA calculation\n")
-                f.write("- ✅ Proceed with updated configuration files\n")
-            elif validation_results['overall_assessment'] == 'FAIR':
-                f.write("- ⚠️ Limited SOFA parameters available\n")
-                f.write("- ⚠️ Consider additional data sources or imputation strategies\n")
+        parts = []
+        parts.append("# Pipeline Rebuild Report\n\n")
+        parts.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        
+        parts.append("## Executive Summary\n\n")
+        parts.append(f"- **Overall Assessment:** {validation_results['overall_assessment']}\n")
+        parts.append(f"- **Bronze Records Created:** {self.stats['bronze_records_created']:,}\n")
+        parts.append(f"- **Silver Records Processed:** {self.stats['silver_records_processed']:,}\n")
+        parts.append(f"- **SOFA Systems Found:** {sum(1 for count in self.stats['sofa_parameters_found'].values() if count > 0)}/6\n\n")
+        
+        parts.append("## SOFA Parameter Discovery\n\n")
+        for system, count in self.stats['sofa_parameters_found'].items():
+            status = "✅" if count > 0 else "❌"
+            parts.append(f"- **{system.title()}:** {status} {count} parameters found\n")
+        parts.append("\n")
+        
+        parts.append("## Detailed Parameter Mapping\n\n")
+        for system, params in self.sofa_parameter_mapping.items():
+            parts.append(f"### {system.title()} System\n\n")
+            if params['found_items']:
+                for item in params['found_items']:
+                    parts.append(f"- **{item['table']}** - ItemID {item['itemid']}: {item['label']} ({item['count']:,} measurements)\n")
             else:
-                f.write("- ❌ Insufficient SOFA parameters for reliable calculation\n")
-                f.write("- ❌ Review MIMIC-IV data availability and extraction logic\n")
+                parts.append("- ❌ No parameters found\n")
+            parts.append("\n")
+        
+        parts.append("## Data Quality Issues\n\n")
+        if self.stats['data_quality_issues']:
+            for issue in self.stats['data_quality_issues']:
+                parts.append(f"- ⚠️ {issue}\n")
+        else:
+            parts.append("- ✅ No major data quality issues detected\n")
+        parts.append("\n")
+        
+        parts.append("## Recommendations\n\n")
+        if validation_results['overall_assessment'] == 'GOOD':
+            parts.append("- ✅ Pipeline is ready for Gold layer SOFA calculation\n")
+            parts.append("- ✅ Proceed with updated configuration files\n")
+        elif validation_results['overall_assessment'] == 'FAIR':
+            parts.append("- ⚠️ Limited SOFA parameters available\n")
+            parts.append("- ⚠️ Consider additional data sources or imputation strategies\n")
+        else:
+            parts.append("- ❌ Insufficient SOFA parameters for reliable calculation\n")
+            parts.append("- ❌ Review MIMIC-IV data availability and extraction logic\n")
+        
+        report_path.write_text(''.join(parts))
         
         self.logger.info(f"📋 Report saved to: {report_path}")
         return report_path
@@ -630,6 +676,17 @@ class PipelineRebuilder:
         start_time = datetime.now()
         
         try:
+            # The rebuild is idempotent, so it runs as one transaction with
+            # relaxed durability and larger sort/hash memory
+            cur = self.cur
+            cur.execute("""
+                SET synchronous_commit = off;
+                SET work_mem = '512MB';
+                SET maintenance_work_mem = '2GB';
+                SET temp_buffers = '1GB';
+                SET jit = off;
+            """)
+            
             # Step 1: Analyze raw data
             sofa_parameters = self.analyze_raw_mimic_data()
             
@@ -641,6 +698,7 @@ class PipelineRebuilder:
             
             # Step 4: Validate pipeline
             validation_results = self.validate_pipeline()
+            self.conn.commit()
             
             # Step 5: Generate report
             report_path = self.generate_rebuild_report(validation_results)
@@ -654,6 +712,7 @@ class PipelineRebuilder:
             
         except Exception as e:
             self.logger.error(f"❌ Pipeline rebuild failed: {e}")
+            self.conn.rollback()
             raise
         finally:
             self.conn.close()
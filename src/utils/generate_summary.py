@@ -7,10 +7,9 @@ QueryBuilder for Medical Data Science (Übungsblatt 3.2)
 Generates a comprehensive summary of the medical data extraction project.
 """
 
-import psycopg2
 import pandas as pd
 from datetime import datetime
-from config import DB_CONFIG
+from config import get_db_pool
 import logging
 
 # Setup logging
@@ -28,7 +27,7 @@ class SummaryReporter:
     def connect(self):
         """Connect to PostgreSQL database."""
         try:
-            self.connection = psycopg2.connect(**DB_CONFIG)
+            self.connection = get_db_pool().getconn()
             logger.info("✅ Connected to database")
             return True
         except Exception as e:
@@ -40,43 +39,45 @@ class SummaryReporter:
         if not self.connection:
             return
             
-        queries = {
-            'total_records': "SELECT COUNT(*) FROM bronze.collection_disease;",
-            'chart_records': "SELECT COUNT(*) FROM bronze.collection_disease WHERE source_table = 'chartevents';",
-            'lab_records': "SELECT COUNT(*) FROM bronze.collection_disease WHERE source_table = 'labevents';",
-            'unique_patients': "SELECT COUNT(DISTINCT subject_id) FROM bronze.collection_disease;",
-            'unique_admissions': "SELECT COUNT(DISTINCT hadm_id) FROM bronze.collection_disease;",
-            'unique_icu_stays': "SELECT COUNT(DISTINCT stay_id) FROM bronze.collection_disease WHERE stay_id IS NOT NULL;",
-            'chart_parameters': "SELECT COUNT(DISTINCT itemid) FROM bronze.collection_disease WHERE source_table = 'chartevents';",
-            'lab_parameters': "SELECT COUNT(DISTINCT itemid) FROM bronze.collection_disease WHERE source_table = 'labevents';",
-            'time_range': """
-                SELECT 
-                    MIN(charttime) as earliest,
-                    MAX(charttime) as latest,
-                    (MAX(charttime) - MIN(charttime)) as span
-                FROM bronze.collection_disease;
-            """
-        }
+        # Single scan over the Bronze table; conditional counts use FILTER
+        query = """
+            SELECT 
+                COUNT(*) AS total_records,
+                COUNT(*) FILTER (WHERE source_table = 'chartevents') AS chart_records,
+                COUNT(*) FILTER (WHERE source_table = 'labevents') AS lab_records,
+                COUNT(DISTINCT subject_id) AS unique_patients,
+                COUNT(DISTINCT hadm_id) AS unique_admissions,
+                COUNT(DISTINCT stay_id) FILTER (WHERE stay_id IS NOT NULL) AS unique_icu_stays,
+                COUNT(DISTINCT itemid) FILTER (WHERE source_table = 'chartevents') AS chart_parameters,
+                COUNT(DISTINCT itemid) FILTER (WHERE source_table = 'labevents') AS lab_parameters,
+                MIN(charttime) AS earliest,
+                MAX(charttime) AS latest,
+                (MAX(charttime) - MIN(charttime)) AS span
+            FROM bronze.collection_disease;
+        """
         
-        for key, query in queries.items():
-            try:
-                cursor = self.connection.cursor()
-                cursor.execute(query)
-                result = cursor.fetchone()
-                
-                if key == 'time_range':
-                    self.report_data[key] = {
-                        'earliest': result[0],
-                        'latest': result[1],
-                        'span': result[2]
-                    }
-                else:
-                    self.report_data[key] = result[0]
-                    
-                cursor.close()
-                
-            except Exception as e:
-                logger.error(f"Error gathering {key}: {e}")
+        keys = [
+            'total_records', 'chart_records', 'lab_records',
+            'unique_patients', 'unique_admissions', 'unique_icu_stays',
+            'chart_parameters', 'lab_parameters'
+        ]
+        
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(query)
+            result = cursor.fetchone()
+            cursor.close()
+            
+            self.report_data.update(zip(keys, result[:len(keys)]))
+            self.report_data['time_range'] = {
+                'earliest': result[-3],
+                'latest': result[-2],
+                'span': result[-1]
+            }
+            
+        except Exception as e:
+            logger.error(f"Error gathering statistics: {e}")
+            for key in keys + ['time_range']:
                 self.report_data[key] = "Error"
     
     def generate_report(self):
@@ -210,9 +211,10 @@ END OF SUMMARY REPORT
             print(report)
     
     def close(self):
-        """Close database connection."""
+        """Return database connection to the pool."""
         if self.connection:
-            self.connection.close()
+            get_db_pool().putconn(self.connection)
+            self.connection = None
 
 def main():
     """Main execution function."""
@@ -11,17 +11,174 @@ Author: Medical Data Science Team
 Date: May 2025
 """
 
+import argparse
+import hashlib
+import json
 import logging
+import logging.handlers
 import sys
-from datetime import datetime
+import time
 from typing import Dict, List, Tuple, Optional
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from src.utils.file_paths import get_log_path
 
 from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.exc import SQLAlchemyError
 import psycopg2
 
+# Number of itemid shards loaded in parallel by insert_chart_data/insert_lab_data
+INSERT_SHARDS = 4
+
+# How run_extraction treats rows already in bronze.collection_disease:
+# rebuild truncates them, append keeps them, incremental skips duplicates
+BRONZE_LOAD_MODES = ('rebuild', 'append', 'incremental')
+
+# Wall-clock milliseconds per run_extraction phase of the most recent run
+PHASE_TIMINGS: Dict[str, float] = {}
+
+# MIMIC-IV schemas probed by connect(); at least two of them must exist
+MIMIC_SCHEMAS = ['mimiciv_hosp', 'mimiciv_icu', 'mimiciv_derived']
+
+# Successful schema probes per connection string, reused for the process lifetime
+_SCHEMA_PROBE_CACHE: Dict[str, List[str]] = {}
+
+# Statements are built once and reused across calls and shards; every
+# variable part is a bound parameter, so the SQL text never changes
+# Itemid resolution fills bronze.itemid_cache server-side and returns only the itemids
+CHART_ITEMIDS_QUERY = text("""
+    INSERT INTO bronze.itemid_cache (source, params_hash, itemid, label)
+    SELECT 'chart', :params_hash, itemid, label
+    FROM mimiciv_icu.d_items
+    WHERE LOWER(label) LIKE ANY(:patterns)
+    ON CONFLICT DO NOTHING
+    RETURNING itemid
+""")
+
+LAB_ITEMIDS_QUERY = text("""
+    INSERT INTO bronze.itemid_cache (source, params_hash, itemid, label)
+    SELECT 'lab', :params_hash, itemid, label
+    FROM mimiciv_hosp.d_labitems
+    WHERE LOWER(label) LIKE ANY(:patterns)
+    ON CONFLICT DO NOTHING
+    RETURNING itemid
+""")
+
+# Sets omop_concept_id in one UPDATE, joining the cached item labels against
+# the (normalized concept name, concept_id) pairs passed as two arrays
+OMOP_UPDATE_QUERY = text("""
+    UPDATE bronze.collection_disease AS cd
+    SET omop_concept_id = m.concept_id
+    FROM bronze.itemid_cache AS c
+    JOIN unnest(CAST(:names AS text[]), CAST(:concept_ids AS integer[])) AS m(name, concept_id)
+      ON TRANSLATE(LOWER(c.label), '-_', '  ') = m.name
+    WHERE cd.itemid = c.itemid
+      AND cd.source_table = c.source || 'events'
+      AND cd.omop_concept_id IS NULL
+""")
+
+# Full item rows, only fetched for DEBUG diagnostics
+CHART_ITEM_DETAILS_QUERY = text("""
+    SELECT itemid, label, unitname, param_type
+    FROM mimiciv_icu.d_items
+    WHERE LOWER(label) LIKE ANY(:patterns)
+    ORDER BY label
+""")
+
+LAB_ITEM_DETAILS_QUERY = text("""
+    SELECT itemid, label, category, fluid
+    FROM mimiciv_hosp.d_labitems
+    WHERE LOWER(label) LIKE ANY(:patterns)
+    ORDER BY label
+""")
+
+CHART_INSERT_QUERY = text("""
+    INSERT INTO bronze.collection_disease 
+    (subject_id, hadm_id, stay_id, charttime, storetime, itemid, value, valuenum, valueuom, source_table)
+    SELECT 
+        subject_id, 
+        hadm_id, 
+        stay_id, 
+        charttime, 
+        storetime, 
+        itemid, 
+        value, 
+        valuenum, 
+        valueuom, 
+        'chartevents'
+    FROM mimiciv_icu.chartevents
+    WHERE itemid = ANY(:itemids)
+    AND valuenum IS NOT NULL
+    AND (warning IS NULL OR warning = 0)
+""")
+
+LAB_INSERT_QUERY = text("""
+    INSERT INTO bronze.collection_disease 
+    (subject_id, hadm_id, stay_id, charttime, storetime, itemid, value, valuenum, valueuom, source_table)
+    SELECT 
+        subject_id, 
+        hadm_id, 
+        NULL as stay_id, 
+        charttime, 
+        storetime, 
+        itemid, 
+        value, 
+        valuenum, 
+        valueuom, 
+        'labevents'
+    FROM mimiciv_hosp.labevents
+    WHERE itemid = ANY(:itemids)
+    AND valuenum IS NOT NULL
+    AND (flag IS NULL OR flag NOT IN ('abnormal', 'error'))
+""")
+
+# Partial covering itemid indexes matching the event insert filters
+SOURCE_INDEXES = [
+    ('mimiciv_icu', 'idx_chartevents_itemid_valuenum', """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chartevents_itemid_valuenum
+        ON mimiciv_icu.chartevents (itemid)
+        INCLUDE (valuenum, warning)
+        WHERE valuenum IS NOT NULL
+    """),
+    ('mimiciv_hosp', 'idx_labevents_itemid_valuenum', """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_labevents_itemid_valuenum
+        ON mimiciv_hosp.labevents (itemid)
+        INCLUDE (valuenum, flag)
+        WHERE valuenum IS NOT NULL
+    """)
+]
+
+# indisvalid of an index, or NULL when it does not exist
+SOURCE_INDEX_VALID_QUERY = text("""
+    SELECT i.indisvalid
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = :schema AND c.relname = :index_name
+""")
+
+# Natural key of a bronze row; charttime is coalesced so rows without one
+# still conflict (NULLS NOT DISTINCT needs PostgreSQL 15, the repo targets 12+)
+NATURAL_KEY_SQL = "source_table, subject_id, COALESCE(charttime, '-infinity'::timestamp), itemid"
+
+# Keeps the lowest id of every natural-key group, so the unique index can be built
+DEDUPLICATE_BRONZE_QUERY = text(f"""
+    DELETE FROM bronze.collection_disease
+    WHERE id IN (
+        SELECT id
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY {NATURAL_KEY_SQL} ORDER BY id) AS rn
+            FROM bronze.collection_disease
+        ) ranked
+        WHERE rn > 1
+    )
+""")
+
+# Incremental-mode inserts skip rows already present under the natural key
+CHART_INSERT_IGNORE_QUERY = text(CHART_INSERT_QUERY.text + "ON CONFLICT DO NOTHING\n")
+LAB_INSERT_IGNORE_QUERY = text(LAB_INSERT_QUERY.text + "ON CONFLICT DO NOTHING\n")
+
 
 class QueryBuilder:
     """
@@ -29,16 +186,22 @@ class QueryBuilder:
     and inserting into Bronze layer schema for Acute Respiratory Failure analysis.
     """
     
-    def __init__(self, connection_string: str):
+    def __init__(self, connection_string: str, mode: str = 'rebuild'):
         """
         Initialize QueryBuilder with database connection.
         
         Args:
             connection_string: PostgreSQL connection string
+            mode: Bronze load mode, one of BRONZE_LOAD_MODES
         """
+        if mode not in BRONZE_LOAD_MODES:
+            raise ValueError(f"Unsupported load mode: {mode}")
         self.connection_string = connection_string
-        self.engine = None
-        self.logger = self._setup_logging()
+        self.mode = mode
+        # Engine and logger (which opens the log file) are created on first use
+        self._engine = None
+        self._logger = None
+        self._conn = None
         
         # OMOP Concept IDs mapping from Übung 2
         self.omop_concepts = {
@@ -81,13 +244,33 @@ class QueryBuilder:
             'srage', 'kl-6', 'pai-1', 'vegf', 'lactate', 'uric acid'
         ]
         
+    @property
+    def logger(self) -> logging.Logger:
+        """Logger, set up on first access."""
+        if self._logger is None:
+            self._logger = self._setup_logging()
+        return self._logger
+        
+    @property
+    def engine(self):
+        """SQLAlchemy engine, created on first access."""
+        if self._engine is None:
+            # Pool sized for the chart and lab insert shards plus the shared connection
+            self._engine = create_engine(
+                self.connection_string,
+                pool_size=2 * INSERT_SHARDS + 1,
+                pool_pre_ping=False,
+                connect_args={'application_name': 'querybuilder'}
+            )
+        return self._engine
+        
     def _setup_logging(self) -> logging.Logger:
         """Setup comprehensive logging configuration."""
         logger = logging.getLogger('QueryBuilder')
         logger.setLevel(logging.INFO)
         
         # Create file handler
-        file_handler = logging.FileHandler(get_log_path('querybuilder.log'), mode='w')
+        file_handler = logging.FileHandler(get_log_path('querybuilder.log'), mode='w', delay=True)
         file_handler.setLevel(logging.INFO)
         
         # Create console handler
@@ -101,8 +284,13 @@ class QueryBuilder:
         file_handler.setFormatter(formatter)
         console_handler.setFormatter(formatter)
         
+        # Buffer file writes; flushed on errors, when full and on close()
+        buffered_file_handler = logging.handlers.MemoryHandler(
+            capacity=1024, target=file_handler
+        )
+        
         # Add handlers to logger
-        logger.addHandler(file_handler)
+        logger.addHandler(buffered_file_handler)
         logger.addHandler(console_handler)
         
         return logger
@@ -115,28 +303,97 @@ class QueryBuilder:
             bool: True if connection successful, False otherwise
         """
         try:
-            self.engine = create_engine(self.connection_string)
+            # One connection is held for the sequential steps of the run
+            self._conn = self.engine.connect()
             
             # Test connection and verify schemas
-            with self.engine.connect() as conn:
-                schemas_query = text("""
-                    SELECT schema_name 
-                    FROM information_schema.schemata 
-                    WHERE schema_name IN ('mimiciv_hosp', 'mimiciv_icu', 'mimiciv_derived')
-                """)
-                schemas = conn.execute(schemas_query).fetchall()
+            with self._transaction() as conn:
+                schemas = self._probe_schemas(conn)
                 
                 if len(schemas) < 2:
                     self.logger.error("Required MIMIC-IV schemas not found")
                     return False
                     
-                self.logger.info(f"✅ Connected to database. Found schemas: {[s[0] for s in schemas]}")
+                self.logger.info("✅ Connected to database. Found schemas: %s", schemas)
                 return True
                 
         except Exception as e:
-            self.logger.error(f"❌ Database connection failed: {str(e)}")
+            self.logger.error("❌ Database connection failed: %s", e)
             return False
             
+    def _probe_schemas(self, conn) -> List[str]:
+        """
+        Return the MIMIC-IV schemas present, probing the catalog once per connection string.
+        
+        Returns:
+            List[str]: Names of the MIMIC_SCHEMAS found in the database
+        """
+        if self.connection_string in _SCHEMA_PROBE_CACHE:
+            return _SCHEMA_PROBE_CACHE[self.connection_string]
+            
+        schemas_query = text("""
+            SELECT schema_name 
+            FROM information_schema.schemata 
+            WHERE schema_name = ANY(:schemas)
+        """)
+        schemas = conn.execute(schemas_query, {'schemas': MIMIC_SCHEMAS}).scalars().all()
+        
+        # Only a successful probe is cached, so a fixed database is re-checked
+        if len(schemas) >= 2:
+            _SCHEMA_PROBE_CACHE[self.connection_string] = schemas
+        return schemas
+        
+    @contextmanager
+    def _timed(self, phase: str):
+        """Record the duration of a run_extraction phase in PHASE_TIMINGS."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            PHASE_TIMINGS[phase] = (time.perf_counter_ns() - start) / 1e6
+            
+    @contextmanager
+    def _transaction(self):
+        """Run a block in its own transaction on the shared connection."""
+        with self._conn.begin():
+            yield self._conn
+            
+    def close(self) -> None:
+        """Release the shared connection and the engine's pool."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._engine is not None:
+            self._engine.dispose()
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.flush()
+            
+    @staticmethod
+    def _params_hash(parameters: List[str]) -> str:
+        """Stable hash of a parameter list, used as the itemid cache key."""
+        return hashlib.sha1(json.dumps(sorted(parameters)).encode()).hexdigest()
+        
+    def _get_cached_itemids(self, conn, source: str, params_hash: str) -> List[int]:
+        """
+        Read itemids cached for a parameter set from bronze.itemid_cache.
+        
+        Returns:
+            List[int]: Cached itemids, empty if the parameter set was never resolved
+        """
+        query = text("""
+            SELECT itemid
+            FROM bronze.itemid_cache
+            WHERE source = :source AND params_hash = :params_hash
+            ORDER BY label
+        """)
+        return conn.execute(query, {'source': source, 'params_hash': params_hash}).scalars().all()
+        
+    def _log_item_details(self, conn, details_query, patterns: List[str], source: str) -> None:
+        """Log the full matching item rows; only called when DEBUG is enabled."""
+        result = conn.execute(details_query, {'patterns': patterns})
+        self.logger.debug("%s items: %s", source, [tuple(row) for row in result])
+            
     def get_chart_itemids(self) -> List[int]:
         """
         Retrieve itemids for chart events parameters.
@@ -145,32 +402,30 @@ class QueryBuilder:
             List[int]: List of itemids for chartevents table
         """
         try:
-            with self.engine.connect() as conn:
-                # Build dynamic WHERE clause for chart parameters
-                conditions = []
-                for param in self.chart_parameters:
-                    conditions.append(f"LOWER(label) LIKE '%{param}%'")
-                
-                where_clause = " OR ".join(conditions)
-                
-                query = text(f"""
-                    SELECT itemid, label, unitname, param_type
-                    FROM mimiciv_icu.d_items 
-                    WHERE {where_clause}
-                    ORDER BY label
-                """)
-                
-                result = conn.execute(query).fetchall()
-                itemids = [row[0] for row in result]
-                
-                self.logger.info(f"📊 Found {len(itemids)} chart itemids:")
-                for row in result:
-                    self.logger.info(f"  - {row[0]}: {row[1]} ({row[2]}, {row[3]})")
+            with self._transaction() as conn:
+                # Reuse the itemids of a previous run with the same parameter set
+                params_hash = self._params_hash(self.chart_parameters)
+                cached = self._get_cached_itemids(conn, 'chart', params_hash)
+                if cached:
+                    self.logger.info("📊 Found %d chart itemids (cached)", len(cached))
+                    return cached
+                
+                # Match all chart parameters in one LIKE ANY over a bound pattern array,
+                # caching the matches in the same statement
+                patterns = [f"%{param}%" for param in self.chart_parameters]
+                
+                itemids = conn.execute(
+                    CHART_ITEMIDS_QUERY, {'patterns': patterns, 'params_hash': params_hash}
+                ).scalars().all()
+                
+                self.logger.info("📊 Found %d chart itemids", len(itemids))
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self._log_item_details(conn, CHART_ITEM_DETAILS_QUERY, patterns, 'chart')
                     
                 return itemids
                 
         except Exception as e:
-            self.logger.error(f"❌ Error retrieving chart itemids: {str(e)}")
+            self.logger.error("❌ Error retrieving chart itemids: %s", e)
             return []
             
     def get_lab_itemids(self) -> List[int]:
@@ -181,32 +436,30 @@ class QueryBuilder:
             List[int]: List of itemids for labevents table
         """
         try:
-            with self.engine.connect() as conn:
-                # Build dynamic WHERE clause for lab parameters
-                conditions = []
-                for param in self.lab_parameters:
-                    conditions.append(f"LOWER(label) LIKE '%{param}%'")
-                
-                where_clause = " OR ".join(conditions)
-                
-                query = text(f"""
-                    SELECT itemid, label, category, fluid
-                    FROM mimiciv_hosp.d_labitems 
-                    WHERE {where_clause}
-                    ORDER BY label
-                """)
-                
-                result = conn.execute(query).fetchall()
-                itemids = [row[0] for row in result]
-                
-                self.logger.info(f"🧪 Found {len(itemids)} lab itemids:")
-                for row in result:
-                    self.logger.info(f"  - {row[0]}: {row[1]} ({row[2]}, {row[3]})")
+            with self._transaction() as conn:
+                # Reuse the itemids of a previous run with the same parameter set
+                params_hash = self._params_hash(self.lab_parameters)
+                cached = self._get_cached_itemids(conn, 'lab', params_hash)
+                if cached:
+                    self.logger.info("🧪 Found %d lab itemids (cached)", len(cached))
+                    return cached
+                
+                # Match all lab parameters in one LIKE ANY over a bound pattern array,
+                # caching the matches in the same statement
+                patterns = [f"%{param}%" for param in self.lab_parameters]
+                
+                itemids = conn.execute(
+                    LAB_ITEMIDS_QUERY, {'patterns': patterns, 'params_hash': params_hash}
+                ).scalars().all()
+                
+                self.logger.info("🧪 Found %d lab itemids", len(itemids))
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self._log_item_details(conn, LAB_ITEM_DETAILS_QUERY, patterns, 'lab')
                     
                 return itemids
                 
         except Exception as e:
-            self.logger.error(f"❌ Error retrieving lab itemids: {str(e)}")
+            self.logger.error("❌ Error retrieving lab itemids: %s", e)
             return []
             
     def create_bronze_schema(self) -> bool:
@@ -217,14 +470,14 @@ class QueryBuilder:
             bool: True if successful, False otherwise
         """
         try:
-            with self.engine.connect() as conn:
+            with self._transaction() as conn:
                 # Create bronze schema
                 conn.execute(text("CREATE SCHEMA IF NOT EXISTS bronze"))
                 
                 # Create collection_disease table
                 create_table_query = text("""
                     CREATE TABLE IF NOT EXISTS bronze.collection_disease (
-                        id SERIAL PRIMARY KEY,
+                        id SERIAL,
                         subject_id INTEGER NOT NULL,
                         hadm_id INTEGER,
                         stay_id INTEGER,
@@ -236,22 +489,242 @@ class QueryBuilder:
                         valueuom TEXT,
                         source_table VARCHAR(50) NOT NULL,
                         omop_concept_id INTEGER,
-                        extraction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        CONSTRAINT fk_source_table CHECK (source_table IN ('chartevents', 'labevents'))
+                        extraction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
                 
                 conn.execute(create_table_query)
-                conn.commit()
+                
+                # A rebuild reloads everything, so the primary key, CHECK and secondary
+                # indexes are built by finalize_bronze_schema after the bulk load instead
+                # of being maintained per row; append/incremental deltas keep them in place
+                if self.mode == 'rebuild':
+                    conn.execute(text("""
+                        ALTER TABLE bronze.collection_disease
+                        DROP CONSTRAINT IF EXISTS collection_disease_pkey,
+                        DROP CONSTRAINT IF EXISTS fk_source_table
+                    """))
+                    conn.execute(text("""
+                        DROP INDEX IF EXISTS
+                            bronze.ix_bronze_cd_itemid,
+                            bronze.ix_bronze_cd_source_covering
+                    """))
+                
+                # Resolved d_items/d_labitems itemids per parameter set
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS bronze.itemid_cache (
+                        source TEXT NOT NULL,
+                        params_hash TEXT NOT NULL,
+                        itemid INTEGER NOT NULL,
+                        label TEXT,
+                        PRIMARY KEY (source, params_hash, itemid)
+                    )
+                """))
                 
                 self.logger.info("✅ Bronze schema and collection_disease table created/verified")
                 return True
                 
         except Exception as e:
-            self.logger.error(f"❌ Error creating bronze schema: {str(e)}")
+            self.logger.error("❌ Error creating bronze schema: %s", e)
+            return False
+            
+    def prepare_bronze_table(self) -> bool:
+        """
+        Prepare bronze.collection_disease for this run's load mode.
+        
+        rebuild truncates a populated table, incremental ensures the unique
+        natural-key index used by ON CONFLICT, append leaves the rows as is.
+        Switching to incremental first removes duplicates left by earlier
+        rebuild/append runs; the other modes drop the index, since their
+        plain inserts may add duplicate keys.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.logger.info("📦 Bronze load mode: %s", self.mode)
+        
+        try:
+            with self._transaction() as conn:
+                if self.mode == 'rebuild':
+                    populated = conn.execute(text(
+                        "SELECT EXISTS (SELECT 1 FROM bronze.collection_disease)"
+                    )).scalar()
+                    if populated:
+                        conn.execute(text("TRUNCATE TABLE bronze.collection_disease RESTART IDENTITY"))
+                        self.logger.info("🧹 Truncated existing bronze.collection_disease rows")
+                        
+                if self.mode == 'incremental':
+                    # Indexes from older runs keyed on raw charttime are replaced too
+                    has_index = conn.execute(text("""
+                        SELECT EXISTS (
+                            SELECT 1 FROM pg_indexes
+                            WHERE schemaname = 'bronze' AND indexname = 'ux_bronze_cd_natural_key'
+                              AND indexdef LIKE '%COALESCE%'
+                        )
+                    """)).scalar()
+                    if not has_index:
+                        conn.execute(text("DROP INDEX IF EXISTS bronze.ux_bronze_cd_natural_key"))
+                        removed = conn.execute(DEDUPLICATE_BRONZE_QUERY).rowcount
+                        if removed:
+                            self.logger.warning("⚠️ Removed %d duplicate bronze rows before incremental load",
+                                                removed)
+                        conn.execute(text(f"""
+                            CREATE UNIQUE INDEX ux_bronze_cd_natural_key
+                            ON bronze.collection_disease ({NATURAL_KEY_SQL})
+                        """))
+                else:
+                    conn.execute(text("DROP INDEX IF EXISTS bronze.ux_bronze_cd_natural_key"))
+                    
+            return True
+            
+        except Exception as e:
+            self.logger.error("❌ Error preparing bronze table: %s", e)
+            return False
+            
+    def ensure_source_indexes(self) -> bool:
+        """
+        Create partial covering itemid indexes on the MIMIC-IV event tables.
+        
+        The indexes match the insert filters exactly, so the loads become
+        index scans instead of sequential scans over all events. This is
+        best-effort: roles without CREATE on the MIMIC schemas still extract,
+        just with sequential scans. An INVALID index left by an interrupted
+        concurrent build is dropped and rebuilt.
+        
+        Returns:
+            bool: True if every index is in place and valid, False otherwise
+        """
+        all_valid = True
+        
+        # CONCURRENTLY cannot run inside a transaction block
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for schema, index_name, index_query in SOURCE_INDEXES:
+                try:
+                    is_valid = conn.execute(SOURCE_INDEX_VALID_QUERY,
+                                            {'schema': schema, 'index_name': index_name}).scalar()
+                    if is_valid is False:
+                        self.logger.warning("⚠️ Rebuilding invalid index %s.%s", schema, index_name)
+                        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{index_name}"))
+                        
+                    conn.execute(text(index_query))
+                    
+                except Exception as e:
+                    self.logger.warning("⚠️ Could not create source index %s.%s, loads will scan: %s",
+                                        schema, index_name, e)
+                    all_valid = False
+                    
+        if all_valid:
+            self.logger.info("✅ Source itemid indexes created/verified")
+        return all_valid
+            
+    def finalize_bronze_schema(self) -> bool:
+        """
+        Add the primary key, source_table CHECK and secondary indexes where missing.
+        
+        After a rebuild all of them were dropped before the bulk load; after
+        an append/incremental run they already exist unless the table was new.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            with self._transaction() as conn:
+                existing = set(conn.execute(text("""
+                    SELECT conname FROM pg_constraint
+                    WHERE conrelid = 'bronze.collection_disease'::regclass
+                """)).scalars())
+                
+                # One sorted B-tree build instead of per-row index maintenance
+                if 'collection_disease_pkey' not in existing:
+                    conn.execute(text("""
+                        ALTER TABLE bronze.collection_disease
+                        ADD CONSTRAINT collection_disease_pkey PRIMARY KEY (id)
+                    """))
+                if 'fk_source_table' not in existing:
+                    conn.execute(text("""
+                        ALTER TABLE bronze.collection_disease
+                        ADD CONSTRAINT fk_source_table
+                        CHECK (source_table IN ('chartevents', 'labevents'))
+                    """))
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_bronze_cd_itemid
+                    ON bronze.collection_disease (itemid)
+                """))
+                # Covering index so per-source counts/distincts are index-only scans
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_bronze_cd_source_covering
+                    ON bronze.collection_disease (source_table)
+                    INCLUDE (subject_id, hadm_id, stay_id, itemid, charttime)
+                """))
+                
+            self.logger.info("✅ Bronze primary key, constraints and indexes in place")
+            return True
+            
+        except Exception as e:
+            self.logger.error("❌ Error finalizing bronze schema: %s", e)
             return False
             
-    def insert_chart_data(self, itemids: List[int]) -> int:
+    def populate_omop_concepts(self) -> int:
+        """
+        Fill omop_concept_id for loaded rows whose item label names an OMOP concept.
+        
+        Labels and concept names are compared case-insensitively with '-'
+        and '_' treated as spaces; rows without an exact match stay NULL.
+        
+        Returns:
+            int: Number of rows updated
+        """
+        names = [name.lower().replace('_', ' ') for name in self.omop_concepts]
+        concept_ids = list(self.omop_concepts.values())
+        
+        try:
+            with self._transaction() as conn:
+                result = conn.execute(OMOP_UPDATE_QUERY, {'names': names, 'concept_ids': concept_ids})
+                
+            self.logger.info("✅ Set omop_concept_id on %d rows", result.rowcount)
+            return result.rowcount
+            
+        except Exception as e:
+            self.logger.error("❌ Error populating OMOP concepts: %s", e)
+            return 0
+            
+    def _insert_shard(self, insert_query, shard: List[int]) -> int:
+        """Run one INSERT ... SELECT for a shard of itemids in its own transaction."""
+        with self.engine.begin() as conn:
+            # Bulk-load settings scoped to this transaction only
+            conn.execute(text("SET LOCAL synchronous_commit = off"))
+            conn.execute(text("SET LOCAL work_mem = '256MB'"))
+            return conn.execute(insert_query, {'itemids': shard}).rowcount
+            
+    def _insert_sharded(self, insert_query, itemids: List[int]) -> Tuple[int, int]:
+        """
+        Split itemids into INSERT_SHARDS shards and load them over parallel connections.
+        
+        Each shard commits on its own, so a failed shard does not undo the
+        others; its error is logged and the rows of the committed shards
+        are still counted.
+        
+        Returns:
+            Tuple[int, int]: Rows committed by successful shards, number of failed shards
+        """
+        shards = [itemids[i::INSERT_SHARDS] for i in range(INSERT_SHARDS)]
+        shards = [shard for shard in shards if shard]
+        rows_committed = 0
+        failed_shards = 0
+        
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [(shard, executor.submit(self._insert_shard, insert_query, shard)) for shard in shards]
+            
+            for shard, future in futures:
+                try:
+                    rows_committed += future.result()
+                except Exception as e:
+                    failed_shards += 1
+                    self.logger.error("❌ Shard with itemids %s failed: %s", shard, e)
+                    
+        return rows_committed, failed_shards
+            
+    def insert_chart_data(self, itemids: List[int]) -> Tuple[int, int]:
         """
         Insert chart events data into bronze table.
         
@@ -259,50 +732,30 @@ class QueryBuilder:
             itemids: List of itemids to extract
             
         Returns:
-            int: Number of rows inserted
+            Tuple[int, int]: Rows committed, number of failed shards (a load
+            that fails before sharding counts as one)
         """
         if not itemids:
             self.logger.warning("⚠️ No chart itemids provided, skipping chart data insertion")
-            return 0
+            return 0, 0
             
         try:
-            with self.engine.connect() as conn:
-                # Convert itemids to tuple for SQL IN clause
-                itemids_tuple = tuple(itemids)
-                
-                insert_query = text("""
-                    INSERT INTO bronze.collection_disease 
-                    (subject_id, hadm_id, stay_id, charttime, storetime, itemid, value, valuenum, valueuom, source_table)
-                    SELECT 
-                        subject_id, 
-                        hadm_id, 
-                        stay_id, 
-                        charttime, 
-                        storetime, 
-                        itemid, 
-                        value, 
-                        valuenum, 
-                        valueuom, 
-                        'chartevents'
-                    FROM mimiciv_icu.chartevents
-                    WHERE itemid = ANY(:itemids)
-                    AND valuenum IS NOT NULL
-                    AND (warning IS NULL OR warning = 0)
-                """)
-                
-                result = conn.execute(insert_query, {'itemids': list(itemids_tuple)})
-                rows_inserted = result.rowcount
-                conn.commit()
-                
-                self.logger.info(f"✅ Inserted {rows_inserted} rows from chartevents with itemids: {itemids}")
-                return rows_inserted
+            insert_query = CHART_INSERT_IGNORE_QUERY if self.mode == 'incremental' else CHART_INSERT_QUERY
+            rows_inserted, failed_shards = self._insert_sharded(insert_query, itemids)
+            
+            if failed_shards:
+                self.logger.error("❌ %d chartevents shards failed; bronze holds a partial load of %d rows",
+                                  failed_shards, rows_inserted)
+            else:
+                self.logger.info("✅ Inserted %d rows from chartevents with itemids: %s", rows_inserted, itemids)
+            return rows_inserted, failed_shards
                 
         except Exception as e:
-            self.logger.error(f"❌ Error inserting chart data: {str(e)}")
-            self.logger.error(f"Full traceback: {traceback.format_exc()}")
-            return 0
+            self.logger.error("❌ Error inserting chart data: %s", e)
+            self.logger.error("Full traceback: %s", traceback.format_exc())
+            return 0, 1
             
-    def insert_lab_data(self, itemids: List[int]) -> int:
+    def insert_lab_data(self, itemids: List[int]) -> Tuple[int, int]:
         """
         Insert lab events data into bronze table.
         
@@ -310,48 +763,28 @@ class QueryBuilder:
             itemids: List of itemids to extract
             
         Returns:
-            int: Number of rows inserted
+            Tuple[int, int]: Rows committed, number of failed shards (a load
+            that fails before sharding counts as one)
         """
         if not itemids:
             self.logger.warning("⚠️ No lab itemids provided, skipping lab data insertion")
-            return 0
+            return 0, 0
             
         try:
-            with self.engine.connect() as conn:
-                # Convert itemids to tuple for SQL IN clause
-                itemids_tuple = tuple(itemids)
-                
-                insert_query = text("""
-                    INSERT INTO bronze.collection_disease 
-                    (subject_id, hadm_id, stay_id, charttime, storetime, itemid, value, valuenum, valueuom, source_table)
-                    SELECT 
-                        subject_id, 
-                        hadm_id, 
-                        NULL as stay_id, 
-                        charttime, 
-                        storetime, 
-                        itemid, 
-                        value, 
-                        valuenum, 
-                        valueuom, 
-                        'labevents'
-                    FROM mimiciv_hosp.labevents
-                    WHERE itemid = ANY(:itemids)
-                    AND valuenum IS NOT NULL
-                    AND (flag IS NULL OR flag NOT IN ('abnormal', 'error'))
-                """)
-                
-                result = conn.execute(insert_query, {'itemids': list(itemids_tuple)})
-                rows_inserted = result.rowcount
-                conn.commit()
-                
-                self.logger.info(f"✅ Inserted {rows_inserted} rows from labevents with itemids: {itemids}")
-                return rows_inserted
+            insert_query = LAB_INSERT_IGNORE_QUERY if self.mode == 'incremental' else LAB_INSERT_QUERY
+            rows_inserted, failed_shards = self._insert_sharded(insert_query, itemids)
+            
+            if failed_shards:
+                self.logger.error("❌ %d labevents shards failed; bronze holds a partial load of %d rows",
+                                  failed_shards, rows_inserted)
+            else:
+                self.logger.info("✅ Inserted %d rows from labevents with itemids: %s", rows_inserted, itemids)
+            return rows_inserted, failed_shards
                 
         except Exception as e:
-            self.logger.error(f"❌ Error inserting lab data: {str(e)}")
-            self.logger.error(f"Full traceback: {traceback.format_exc()}")
-            return 0
+            self.logger.error("❌ Error inserting lab data: %s", e)
+            self.logger.error("Full traceback: %s", traceback.format_exc())
+            return 0, 1
             
     def validate_results(self) -> bool:
         """
@@ -361,42 +794,43 @@ class QueryBuilder:
             bool: True if validation successful, False otherwise
         """
         try:
-            with self.engine.connect() as conn:
-                # Count total records
-                total_query = text("SELECT COUNT(*) FROM bronze.collection_disease")
-                total_count = conn.execute(total_query).scalar()
-                
-                # Count by source table
-                source_query = text("""
-                    SELECT source_table, COUNT(*) as count 
-                    FROM bronze.collection_disease 
-                    GROUP BY source_table
-                """)
-                source_counts = conn.execute(source_query).fetchall()
-                
-                # Sample records
-                sample_query = text("""
-                    SELECT subject_id, hadm_id, itemid, value, valuenum, source_table
-                    FROM bronze.collection_disease 
-                    LIMIT 10
+            with self._transaction() as conn:
+                # Per-source counts (total derived from them) and a sample in one round-trip
+                validation_query = text("""
+                    WITH source_counts AS (
+                        SELECT source_table, COUNT(*) AS count
+                        FROM bronze.collection_disease
+                        GROUP BY source_table
+                    ),
+                    sample_records AS (
+                        SELECT subject_id, hadm_id, itemid, value, valuenum, source_table
+                        FROM bronze.collection_disease
+                        LIMIT 10
+                    )
+                    SELECT
+                        (SELECT COALESCE(SUM(count), 0)::bigint FROM source_counts),
+                        (SELECT json_agg(source_counts) FROM source_counts),
+                        (SELECT json_agg(sample_records) FROM sample_records)
                 """)
-                sample_records = conn.execute(sample_query).fetchall()
+                total_count, source_counts, sample_records = conn.execute(validation_query).one()
                 
                 # Log validation results
-                self.logger.info(f"📈 VALIDATION RESULTS:")
-                self.logger.info(f"  Total records inserted: {total_count}")
+                self.logger.info("📈 VALIDATION RESULTS:")
+                self.logger.info("  Total records inserted: %s", total_count)
                 
-                for source, count in source_counts:
-                    self.logger.info(f"  {source}: {count} records")
+                for source in source_counts or []:
+                    self.logger.info("  %s: %s records", source['source_table'], source['count'])
                     
-                self.logger.info(f"📋 Sample records:")
-                for record in sample_records:
-                    self.logger.info(f"  Subject: {record[0]}, HADM: {record[1]}, Item: {record[2]}, Value: {record[3]}, Source: {record[5]}")
+                self.logger.info("📋 Sample records:")
+                for record in sample_records or []:
+                    self.logger.info("  Subject: %s, HADM: %s, Item: %s, Value: %s, Source: %s",
+                                     record['subject_id'], record['hadm_id'], record['itemid'],
+                                     record['value'], record['source_table'])
                     
                 return total_count > 0
                 
         except Exception as e:
-            self.logger.error(f"❌ Error during validation: {str(e)}")
+            self.logger.error("❌ Error during validation: %s", e)
             return False
             
     def run_extraction(self) -> bool:
@@ -406,22 +840,32 @@ class QueryBuilder:
         Returns:
             bool: True if extraction successful, False otherwise
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter_ns()
+        PHASE_TIMINGS.clear()
         self.logger.info("🚀 Starting QueryBuilder extraction process...")
         
         try:
             # Step 1: Connect to database
-            if not self.connect():
-                return False
+            with self._timed('connect'):
+                if not self.connect():
+                    return False
                 
             # Step 2: Create bronze schema
-            if not self.create_bronze_schema():
-                return False
+            with self._timed('schema'):
+                if not self.create_bronze_schema():
+                    return False
+                    
+                if not self.prepare_bronze_table():
+                    return False
+                    
+                # Best-effort: missing indexes only slow the loads down
+                self.ensure_source_indexes()
                 
             # Step 3: Get itemids
             self.logger.info("📋 Step 3: Retrieving itemids...")
-            chart_itemids = self.get_chart_itemids()
-            lab_itemids = self.get_lab_itemids()
+            with self._timed('itemids'):
+                chart_itemids = self.get_chart_itemids()
+                lab_itemids = self.get_lab_itemids()
             
             if not chart_itemids and not lab_itemids:
                 self.logger.error("❌ No itemids found, aborting extraction")
@@ -429,41 +873,65 @@ class QueryBuilder:
                 
             # Step 4: Insert data
             self.logger.info("💾 Step 4: Inserting data...")
-            chart_rows = self.insert_chart_data(chart_itemids)
-            lab_rows = self.insert_lab_data(lab_itemids)
+            with self._timed('insert'):
+                # chartevents and labevents are disjoint sources; load them concurrently
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    chart_future = executor.submit(self.insert_chart_data, chart_itemids)
+                    lab_future = executor.submit(self.insert_lab_data, lab_itemids)
+                    (chart_rows, chart_failed), (lab_rows, lab_failed) = chart_future.result(), lab_future.result()
             
             total_rows = chart_rows + lab_rows
+            # Constraints are still restored below, but a partial load never counts as success
+            failed_shards = chart_failed + lab_failed
+            
+            with self._timed('finalize'):
+                if not self.finalize_bronze_schema():
+                    return False
+                    
+                self.populate_omop_concepts()
             
             # Step 5: Validate results
             self.logger.info("✅ Step 5: Validating results...")
-            validation_success = self.validate_results()
+            with self._timed('validate'):
+                validation_success = self.validate_results()
             
             # Summary
-            end_time = datetime.now()
-            duration = end_time - start_time
+            duration_ms = (time.perf_counter_ns() - start_time) / 1e6
             
-            self.logger.info(f"🎯 EXTRACTION SUMMARY:")
-            self.logger.info(f"  Duration: {duration}")
-            self.logger.info(f"  Total rows inserted: {total_rows}")
-            self.logger.info(f"  Chart events: {chart_rows}")
-            self.logger.info(f"  Lab events: {lab_rows}")
-            self.logger.info(f"  Validation: {'✅ PASSED' if validation_success else '❌ FAILED'}")
+            self.logger.info("🎯 EXTRACTION SUMMARY:")
+            self.logger.info("  Duration: %.1f ms", duration_ms)
+            self.logger.info("  Phase timings (ms): %s",
+                             ', '.join(f"{phase}={ms:.1f}" for phase, ms in PHASE_TIMINGS.items()))
+            self.logger.info("  Load mode: %s", self.mode)
+            self.logger.info("  Total rows inserted: %d", total_rows)
+            self.logger.info("  Chart events: %d", chart_rows)
+            self.logger.info("  Lab events: %d", lab_rows)
+            self.logger.info("  Failed shards: %d", failed_shards)
+            self.logger.info("  Validation: %s", '✅ PASSED' if validation_success else '❌ FAILED')
             
-            return validation_success and total_rows > 0
+            return validation_success and total_rows > 0 and not failed_shards
             
         except Exception as e:
-            self.logger.error(f"❌ Fatal error during extraction: {str(e)}")
-            self.logger.error(f"Full traceback: {traceback.format_exc()}")
+            self.logger.error("❌ Fatal error during extraction: %s", e)
+            self.logger.error("Full traceback: %s", traceback.format_exc())
             return False
+            
+        finally:
+            self.close()
 
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Extract MIMIC-IV parameters into the Bronze layer")
+    parser.add_argument('--mode', choices=BRONZE_LOAD_MODES, default='rebuild',
+                        help="How to treat rows already in bronze.collection_disease")
+    args = parser.parse_args()
+    
     # Database connection string
     connection_string = "postgresql://umutyesildal@localhost:5432/mimiciv"
     
     # Initialize and run QueryBuilder
-    qb = QueryBuilder(connection_string)
+    qb = QueryBuilder(connection_string, mode=args.mode)
     
     success = qb.run_extraction()
     
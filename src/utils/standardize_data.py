@@ -23,6 +23,21 @@ from config_silver import (
     SILVER_SCHEMA, SILVER_TABLE, QUALITY_FLAGS
 )
 
+# Flat OMOP lookup table sorted by itemid, built once at import
+_OMOP_TABLE = pd.DataFrame.from_dict(OMOP_MAPPING, orient='index').sort_index()
+_OMOP_ITEMIDS = _OMOP_TABLE.index.to_numpy(dtype=np.int64)
+
+
+def map_itemids(itemids):
+    """Return (row positions into _OMOP_TABLE, mapped mask) for an itemid array."""
+    itemids = np.asarray(itemids, dtype=np.int64)
+    if len(_OMOP_ITEMIDS) == 0:
+        return np.zeros(len(itemids), dtype=np.intp), np.zeros(len(itemids), dtype=bool)
+    
+    positions = np.searchsorted(_OMOP_ITEMIDS, itemids).clip(max=len(_OMOP_ITEMIDS) - 1)
+    return positions, _OMOP_ITEMIDS[positions] == itemids
+
+
 class SilverLayerProcessor:
     """Processes Bronze layer data into standardized Silver layer."""
     
@@ -147,19 +162,19 @@ class SilverLayerProcessor:
         """Enrich data with OMOP concept mappings."""
         self.logger.info("🏷️ Enriching data with OMOP concepts...")
         
-        # Create OMOP mapping DataFrame
-        omop_df = pd.DataFrame.from_dict(OMOP_MAPPING, orient='index').reset_index()
-        omop_df.rename(columns={'index': 'itemid'}, inplace=True)
-        
-        # Merge with bronze data
-        enriched_df = df.merge(omop_df, on='itemid', how='left')
+        # Binary-search every itemid against the sorted OMOP lookup table
+        positions, mapped = map_itemids(df['itemid'].to_numpy())
         
         # Log unmapped items
-        unmapped = enriched_df[enriched_df['concept_id'].isna()]
-        if len(unmapped) > 0:
-            unmapped_items = unmapped['itemid'].unique()
+        if not mapped.all():
+            unmapped_items = df.loc[~mapped, 'itemid'].unique()
             self.logger.warning(f"⚠️ Unmapped itemids: {unmapped_items}")
         
+        enriched_df = df[mapped].copy()
+        omop_rows = _OMOP_TABLE.iloc[positions[mapped]]
+        for column in _OMOP_TABLE.columns:
+            enriched_df[column] = omop_rows[column].to_numpy()
+        
         # Remove unmapped records
         enriched_df = enriched_df.dropna(subset=['concept_id'])
         
@@ -176,42 +191,47 @@ class SilverLayerProcessor:
         
         conversions_performed = 0
         
-        for idx, row in df.iterrows():
-            current_unit = str(row['valueuom']).strip() if pd.notna(row['valueuom']) else 'unknown'
-            target_unit = row['standard_unit']
+        current_unit = df['valueuom'].astype(str).str.strip().where(df['valueuom'].notna(), 'unknown')
+        target_unit = df['standard_unit'].astype(str)
+        
+        # Units that already match only need their spelling normalized
+        same_unit = current_unit.str.lower() == target_unit.str.lower()
+        df.loc[same_unit, 'valueuom'] = target_unit[same_unit]
+        
+        # Convert each (source unit, target unit) group with one array call
+        unit_pairs = pd.DataFrame({'current': current_unit, 'target': target_unit})[~same_unit]
+        
+        for conversion_key, idx in unit_pairs.groupby(['current', 'target']).groups.items():
+            current, target = conversion_key
             
-            # Skip if units already match
-            if current_unit.lower() == target_unit.lower():
-                df.at[idx, 'valueuom'] = target_unit
-                continue
-                
-            # Try to find conversion
-            conversion_key = (current_unit, target_unit)
             if conversion_key in UNIT_CONVERSIONS:
                 try:
-                    old_value = row['valuenum']
-                    new_value = UNIT_CONVERSIONS[conversion_key](old_value)
+                    old_values = df.loc[idx, 'valuenum'].to_numpy(dtype=float)
+                    new_values = UNIT_CONVERSIONS[conversion_key](old_values)
                     
-                    df.at[idx, 'valuenum'] = new_value
-                    df.at[idx, 'valueuom'] = target_unit
-                    df.at[idx, 'transformation_log'] = f"Unit converted: {current_unit}→{target_unit} ({old_value}→{new_value:.3f})"
+                    df.loc[idx, 'valuenum'] = new_values
+                    df.loc[idx, 'valueuom'] = target
+                    df.loc[idx, 'transformation_log'] = [
+                        f"Unit converted: {current}→{target} ({old}→{new:.3f})"
+                        for old, new in zip(old_values, new_values)
+                    ]
                     
-                    conversions_performed += 1
+                    conversions_performed += len(idx)
                     
                     # Track conversion statistics
-                    if conversion_key not in self.stats['unit_conversions']:
-                        self.stats['unit_conversions'][conversion_key] = 0
-                    self.stats['unit_conversions'][conversion_key] += 1
+                    self.stats['unit_conversions'][conversion_key] = (
+                        self.stats['unit_conversions'].get(conversion_key, 0) + len(idx)
+                    )
                     
                 except Exception as e:
                     self.logger.warning(f"⚠️ Unit conversion failed for {conversion_key}: {e}")
-                    df.at[idx, 'error_flag'] = True
-                    df.at[idx, 'transformation_log'] = f"Unit conversion failed: {current_unit}→{target_unit}"
+                    df.loc[idx, 'error_flag'] = True
+                    df.loc[idx, 'transformation_log'] = f"Unit conversion failed: {current}→{target}"
             else:
                 # Log unknown conversion
-                if current_unit != 'unknown' and current_unit != target_unit:
-                    self.logger.warning(f"⚠️ No conversion found: {current_unit} → {target_unit}")
-                    df.at[idx, 'transformation_log'] = f"Unknown unit conversion: {current_unit}"
+                if current != 'unknown' and current != target:
+                    self.logger.warning(f"⚠️ No conversion found: {current} → {target} ({len(idx):,} records)")
+                    df.loc[idx, 'transformation_log'] = f"Unknown unit conversion: {current}"
         
         self.stats['records_converted'] = conversions_performed
         self.logger.info(f"✅ Performed {conversions_performed:,} unit conversions")
@@ -222,27 +242,38 @@ class SilverLayerProcessor:
         """Detect and flag outliers based on clinical limits."""
         self.logger.info("🔍 Detecting outliers using clinical limits...")
         
-        outliers_detected = 0
+        if 'is_outlier' not in df.columns:
+            df['is_outlier'] = False
         
-        for idx, row in df.iterrows():
-            concept_name = row['concept_name']
-            value = row['valuenum']
-            
-            # Use concept-specific limits or parameter-specific limits
-            limits = row.get('limits') or CLINICAL_LIMITS.get(concept_name)
+        # Use concept-specific limits or parameter-specific limits
+        limits = df['concept_name'].map(CLINICAL_LIMITS)
+        if 'limits' in df.columns:
+            limits = df['limits'].where(df['limits'].notna(), limits)
+        
+        checked = limits.notna() & df['valuenum'].notna()
+        
+        # Factorize the distinct limit pairs into lower/upper arrays for one broadcast compare
+        codes, unique_limits = pd.factorize(limits[checked].map(tuple))
+        lower = np.array([lim[0] for lim in unique_limits], dtype=float)[codes]
+        upper = np.array([lim[1] for lim in unique_limits], dtype=float)[codes]
+        
+        values = df.loc[checked, 'valuenum'].to_numpy(dtype=float)
+        outlier_mask = (values < lower) | (values > upper)
+        outlier_idx = df.index[checked][outlier_mask]
+        
+        df.loc[outlier_idx, 'is_outlier'] = True
+        
+        outlier_logs = []
+        for idx, value, min_val, max_val in zip(outlier_idx, values[outlier_mask],
+                                                lower[outlier_mask], upper[outlier_mask]):
+            current_log = df.at[idx, 'transformation_log']
+            outlier_logs.append(f"{current_log}; Outlier: {value} outside [{min_val}, {max_val}]".strip('; '))
             
-            if limits and pd.notna(value):
-                min_val, max_val = limits
-                
-                if value < min_val or value > max_val:
-                    df.at[idx, 'is_outlier'] = True
-                    current_log = df.at[idx, 'transformation_log']
-                    df.at[idx, 'transformation_log'] = f"{current_log}; Outlier: {value} outside [{min_val}, {max_val}]".strip('; ')
-                    
-                    outliers_detected += 1
-                    
-                    self.logger.warning(f"⚠️ Outlier detected: {concept_name}={value} (limits: {min_val}-{max_val}), subject_id={row['subject_id']}")
+            self.logger.warning(f"⚠️ Outlier detected: {df.at[idx, 'concept_name']}={value} (limits: {min_val}-{max_val}), subject_id={df.at[idx, 'subject_id']}")
+        
+        df.loc[outlier_idx, 'transformation_log'] = outlier_logs
         
+        outliers_detected = len(outlier_idx)
         self.stats['outliers_detected'] = outliers_detected
         self.logger.info(f"🚨 Detected {outliers_detected:,} outliers")
         
@@ -8,8 +8,7 @@ Quick status check script to verify project completeness.
 """
 
 import os
-import psycopg2
-from config import DB_CONFIG
+from config import get_db_pool
 import logging
 
 # Suppress warnings for cleaner output
@@ -33,9 +32,12 @@ def check_files():
     print("📁 FILE STATUS CHECK")
     print("=" * 30)
     
+    # One directory read instead of a stat() per file
+    present = {entry.name for entry in os.scandir('.')}
+    
     all_exist = True
     for file in required_files:
-        exists = os.path.exists(file)
+        exists = file in present
         status = "✅" if exists else "❌"
         print(f"{status} {file}")
         if not exists:
@@ -49,7 +51,13 @@ def check_database():
     print("=" * 30)
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        pool = get_db_pool()
+        conn = pool.getconn()
+    except Exception as e:
+        print(f"❌ Database check failed: {e}")
+        return False
+    
+    try:
         print("✅ Database connection")
         
         cursor = conn.cursor()
@@ -79,12 +87,13 @@ def check_database():
         print(f"✅ Records in table: {count:,}")
         
         cursor.close()
-        conn.close()
         return True
         
     except Exception as e:
         print(f"❌ Database check failed: {e}")
         return False
+    finally:
+        pool.putconn(conn)
 
 def check_logs():
     """Check if log files exist."""
@@ -93,8 +102,10 @@ def check_logs():
     
     log_files = ['querybuilder.log', 'FINAL_SUMMARY_REPORT.txt']
     
+    present = {entry.name for entry in os.scandir('.')}
+    
     for log_file in log_files:
-        exists = os.path.exists(log_file)
+        exists = log_file in present
         status = "✅" if exists else "❌"
         print(f"{status} {log_file}")
 
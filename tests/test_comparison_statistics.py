@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Comparison Statistics Regression Test
+=====================================
+
+Checks the vectorized masked statistics of calculate_correlations against
+scipy.stats on the valid pairs of random scores with missing values.
+Needs no database connection.
+"""
+
+import logging
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+stats = pytest.importorskip('scipy.stats')
+comparison = pytest.importorskip('src.analysis.comparison_analysis')
+
+
+def paired_scores(seed, rows=500, missing=0.15):
+    """Integer-valued scores (so Spearman sees ties) with NaNs on either side"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for score in comparison.SCORE_COLUMNS:
+        base = rng.integers(0, 30, rows).astype(float)
+        config1 = base + rng.integers(-3, 4, rows)
+        config2 = base + rng.integers(-3, 4, rows)
+        config1[rng.random(rows) < missing] = np.nan
+        config2[rng.random(rows) < missing] = np.nan
+        data[f'{score}_config1'] = config1
+        data[f'{score}_config2'] = config2
+    # One consolidated float block, as an ordinary DataFrame constructor builds it
+    return pd.DataFrame(data)
+
+
+def calculate_correlations(merged_df):
+    """Run ConfigurationComparison.calculate_correlations without a database engine"""
+    analyzer = SimpleNamespace(logger=logging.getLogger('test_comparison_statistics'), results={})
+    return comparison.ConfigurationComparison.calculate_correlations(analyzer, merged_df)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_statistics_match_scipy(seed):
+    """r, p and t agree with scipy.stats on the rows where both scores are present"""
+    merged_df = paired_scores(seed)
+    correlations = calculate_correlations(merged_df)
+
+    for score in comparison.SCORE_COLUMNS:
+        x = merged_df[f'{score}_config1'].to_numpy()
+        y = merged_df[f'{score}_config2'].to_numpy()
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[valid], y[valid]
+        result = correlations[score]
+
+        pearson = stats.pearsonr(x, y)
+        spearman = stats.spearmanr(x, y)
+        t_test = stats.ttest_rel(x, y)
+        wilcoxon = stats.wilcoxon(x - y)
+
+        assert result['sample_size'] == valid.sum()
+        assert result['pearson_r'] == pytest.approx(pearson[0], rel=1e-6)
+        assert result['pearson_p'] == pytest.approx(pearson[1], rel=1e-5)
+        assert result['spearman_r'] == pytest.approx(spearman[0], rel=1e-6)
+        assert result['spearman_p'] == pytest.approx(spearman[1], rel=1e-5)
+        assert result['t_test_stat'] == pytest.approx(t_test[0], rel=1e-6)
+        assert result['t_test_p'] == pytest.approx(t_test[1], rel=1e-5)
+        assert result['wilcoxon_stat'] == pytest.approx(wilcoxon[0])
+        assert result['wilcoxon_p'] == pytest.approx(wilcoxon[1])
+        assert result['mean_absolute_difference'] == pytest.approx(np.mean(np.abs(x - y)))
+        assert result['config1_mean'] == pytest.approx(np.mean(x))
+        assert result['config2_std'] == pytest.approx(np.std(y, ddof=1))
+        assert result['config1_median'] == pytest.approx(np.median(x))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Score Ladder Regression Test
+============================
+
+Checks the threshold ladders of the simplified Gold scores against the
+original np.where chains, at every threshold boundary and for missing
+values. Needs no database connection.
+"""
+
+import itertools
+import logging
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+gold = pytest.importorskip('src.etl.gold_etl_pipeline_simple')
+
+# Each threshold, a value just either side of it, extremes and NaN
+BOUNDARY_VALUES = {
+    'heart_rate': [np.nan, 0.0, 109.9, 110.0, 110.1, 119.9, 120.0, 120.1, 125.0, 125.1,
+                   149.9, 150.0, 150.1, 160.0, 160.1, 300.0],
+    'respiratory_rate': [np.nan, 0.0, 25.0, 25.1, 30.0, 30.1, 35.0, 35.1, 80.0],
+    'creatinine': [np.nan, 0.0, 1.2, 1.21, 2.0, 2.01, 3.5, 3.51, 5.0, 5.01, 20.0]
+}
+
+
+def reference_scores(df):
+    """The np.where chains the ladders replaced"""
+    scores = pd.DataFrame(0, index=df.index, columns=list(gold.SCORE_MAXIMUMS))
+
+    if 'heart_rate' in df.columns:
+        scores['apache_ii_score'] += np.where(df['heart_rate'] > 150, 4,
+                                     np.where(df['heart_rate'] > 110, 2, 0))
+    if 'respiratory_rate' in df.columns:
+        scores['apache_ii_score'] += np.where(df['respiratory_rate'] > 35, 4,
+                                     np.where(df['respiratory_rate'] > 25, 1, 0))
+    if 'creatinine' in df.columns:
+        scores['apache_ii_score'] += np.where(df['creatinine'] > 3.5, 4,
+                                     np.where(df['creatinine'] > 2.0, 3,
+                                     np.where(df['creatinine'] > 1.2, 2, 0)))
+
+    if 'respiratory_rate' in df.columns:
+        scores['sofa_score'] += np.where(df['respiratory_rate'] > 30, 2,
+                                np.where(df['respiratory_rate'] > 25, 1, 0))
+    if 'heart_rate' in df.columns:
+        scores['sofa_score'] += np.where(df['heart_rate'] > 120, 2, 0)
+    if 'creatinine' in df.columns:
+        scores['sofa_score'] += np.where(df['creatinine'] > 5.0, 4,
+                                np.where(df['creatinine'] > 3.5, 3,
+                                np.where(df['creatinine'] > 2.0, 2,
+                                np.where(df['creatinine'] > 1.2, 1, 0))))
+
+    if 'heart_rate' in df.columns:
+        scores['saps_ii_score'] += np.where(df['heart_rate'] > 160, 7,
+                                   np.where(df['heart_rate'] > 120, 4, 0))
+        scores['oasis_score'] += np.where(df['heart_rate'] > 125, 3, 0)
+
+    for score, maximum in gold.SCORE_MAXIMUMS.items():
+        scores[score] = np.clip(scores[score], 0, maximum)
+    return scores
+
+
+def calculate_scores(df):
+    """Run GoldETLPipeline.calculate_simplified_scores without a database engine"""
+    pipeline = SimpleNamespace(logger=logging.getLogger('test_score_ladders'),
+                               stats={'scores_calculated': 0})
+    return gold.GoldETLPipeline.calculate_simplified_scores(pipeline, df.copy())
+
+
+@pytest.mark.parametrize('columns', [
+    ('heart_rate', 'respiratory_rate', 'creatinine'),
+    ('heart_rate',),
+    ('respiratory_rate', 'creatinine'),
+    ()
+])
+def test_ladders_match_where_chains(columns):
+    """Every boundary combination scores the same as the original chains"""
+    rows = list(itertools.product(*(BOUNDARY_VALUES[column] for column in columns)))
+    df = pd.DataFrame(rows, columns=list(columns), dtype=float)
+
+    result = calculate_scores(df)
+    expected = reference_scores(df)
+
+    for score in gold.SCORE_MAXIMUMS:
+        np.testing.assert_array_equal(result[score].to_numpy(), expected[score].to_numpy(), err_msg=score)
+
+
+@pytest.mark.parametrize('column', list(BOUNDARY_VALUES))
+def test_ladder_points_treats_nan_as_zero(column):
+    """Missing inputs earn no points on any ladder"""
+    for ladders in gold.SCORE_LADDERS.values():
+        for ladder_column, thresholds, points in ladders:
+            if ladder_column == column:
+                assert gold.ladder_points(np.array([np.nan]), thresholds, points)[0] == 0
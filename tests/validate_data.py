@@ -51,7 +51,7 @@ class DataValidator:
         
         try:
             with self.engine.connect() as conn:
-                # 1. Basic Statistics
+                # 1. Basic Statistics + 2. Data Quality Checks (single scan)
                 stats_query = text("""
                     SELECT 
                         source_table,
@@ -59,7 +59,10 @@ class DataValidator:
                         COUNT(DISTINCT subject_id) as unique_patients,
                         COUNT(DISTINCT itemid) as unique_items,
                         MIN(charttime) as earliest_time,
-                        MAX(charttime) as latest_time
+                        MAX(charttime) as latest_time,
+                        COUNT(*) FILTER (WHERE valuenum IS NULL) as null_values,
+                        COUNT(*) FILTER (WHERE valuenum < 0) as negative_values,
+                        COUNT(*) FILTER (WHERE value IS NULL AND valuenum IS NULL) as completely_null
                     FROM bronze.collection_disease
                     GROUP BY source_table
                 """)
@@ -74,25 +77,12 @@ class DataValidator:
                     self.logger.info(f"    Items: {row[3]:,}")
                     self.logger.info(f"    Time range: {row[4]} to {row[5]}")
                 
-                # 2. Data Quality Checks
-                quality_query = text("""
-                    SELECT 
-                        source_table,
-                        COUNT(CASE WHEN valuenum IS NULL THEN 1 END) as null_values,
-                        COUNT(CASE WHEN valuenum < 0 THEN 1 END) as negative_values,
-                        COUNT(CASE WHEN value IS NULL AND valuenum IS NULL THEN 1 END) as completely_null
-                    FROM bronze.collection_disease
-                    GROUP BY source_table
-                """)
-                
-                quality = conn.execute(quality_query).fetchall()
-                
                 self.logger.info("🔍 Data Quality Checks:")
-                for row in quality:
+                for row in stats:
                     self.logger.info(f"  {row[0]}:")
-                    self.logger.info(f"    Null numeric values: {row[1]:,}")
-                    self.logger.info(f"    Negative values: {row[2]:,}")
-                    self.logger.info(f"    Completely null: {row[3]:,}")
+                    self.logger.info(f"    Null numeric values: {row[6]:,}")
+                    self.logger.info(f"    Negative values: {row[7]:,}")
+                    self.logger.info(f"    Completely null: {row[8]:,}")
                 
                 # 3. Top Items by Frequency
                 items_query = text("""
@@ -124,28 +114,21 @@ class DataValidator:
         
         try:
             with self.engine.connect() as conn:
-                # Patient demographics
-                patient_query = text("""
+                # Patient demographics and time range in one scan
+                summary_query = text("""
                     SELECT 
                         COUNT(DISTINCT cd.subject_id) as total_patients,
                         COUNT(DISTINCT cd.hadm_id) as total_admissions,
-                        COUNT(DISTINCT cd.stay_id) as total_icu_stays
+                        COUNT(DISTINCT cd.stay_id) as total_icu_stays,
+                        MIN(cd.charttime) as earliest_record,
+                        MAX(cd.charttime) as latest_record,
+                        COUNT(DISTINCT DATE(cd.charttime)) as unique_days
                     FROM bronze.collection_disease cd
                 """)
                 
-                patient_stats = conn.execute(patient_query).fetchone()
-                
-                # Time range analysis
-                time_query = text("""
-                    SELECT 
-                        MIN(charttime) as earliest_record,
-                        MAX(charttime) as latest_record,
-                        COUNT(DISTINCT DATE(charttime)) as unique_days
-                    FROM bronze.collection_disease
-                    WHERE charttime IS NOT NULL
-                """)
-                
-                time_stats = conn.execute(time_query).fetchone()
+                summary_stats = conn.execute(summary_query).fetchone()
+                patient_stats = summary_stats[:3]
+                time_stats = summary_stats[3:]
                 
                 self.logger.info("📈 SUMMARY REPORT:")
                 self.logger.info(f"  Total unique patients: {patient_stats[0]:,}")